@@ -1,7 +1,11 @@
+import argparse
 import matplotlib.pyplot as plt
+from html import escape
 from pathlib import Path
 import graphviz
-from collections import Counter
+from bow import BowVectorizer
+from runs import Block, compress
+from shared import use_dataset_modules
 
 data = """
 Worm.Win32.Zwr.c,
@@ -34,22 +38,76 @@ Worm.Win32.Zwr.c,
 "UnregisterClassW"
 """
 
-def crea_grafo_bow_pipeline(lista_parole: list, nome_file: str = 'grafo_bow_pipeline_final'):
+def _tabella_bow(vocabolario: list, vettore: list, top_k: int | None = None, colonne_per_riga: int | None = None) -> str:
+    """
+    Tabella HTML (label graphviz) con indici, API e conteggi del vettore BoW.
+    Con top_k mostra solo le k feature più frequenti (nell'ordine del vocabolario) più una colonna
+    che riassume le altre; con colonne_per_riga va a capo ogni tot colonne, ripetendo indici e conteggi.
+    La stringa viene costruita per parti e unita una volta sola.
+    """
+    colonne = list(range(len(vocabolario)))
+    omesse = []
+    if top_k is not None and len(colonne) > top_k:
+        scelte = set(sorted(colonne, key=lambda i: -vettore[i])[:top_k])
+        omesse = [i for i in colonne if i not in scelte]
+        colonne = [i for i in colonne if i in scelte]
+
+    celle = [(f'<B>{i}</B>', escape(str(vocabolario[i]), quote=False), f'<B>{vettore[i]}</B>') for i in colonne]
+    if omesse:
+        celle.append(('<B>…</B>', f'<I>altre {len(omesse)} feature</I>', f'<B>Σ {sum(vettore[i] for i in omesse)}</B>'))
+    larghezza = colonne_per_riga or len(celle)
+    gruppi = [celle[i:i + larghezza] for i in range(0, len(celle), larghezza)] or [[]]
+
+    def riga(valori, bgcolor: str | None = None) -> str:
+        attributo = f' BGCOLOR="{bgcolor}"' if bgcolor else ''
+        return '<TR>' + ''.join(f'<TD{attributo}>{valore}</TD>' for valore in valori) + '</TR>'
+
+    def intestazione(testo: str) -> str:
+        return f'<TR><TD COLSPAN="{larghezza}" BGCOLOR="#E6E6FA"><B>{testo}</B></TD></TR>'
+
+    parti = ['<<TABLE BORDER="0" CELLBORDER="1" CELLSPACING="0">']
+    if len(gruppi) == 1:
+        # Riga A: intestazione, B: indici, C: API, D: intestazione, E: conteggi
+        indici, parole, conteggi = zip(*gruppi[0]) if gruppi[0] else ((), (), ())
+        parti += [
+            intestazione('Vocabolario Ordinato (Feature)'),
+            riga(indici, '#ADD8E6'),
+            riga(parole),
+            intestazione('Vettore Frequenze (BoW)'),
+            riga(conteggi, '#FFC0CB'),
+        ]
+    else:
+        # A capo: ogni gruppo di colonne ha le sue righe di indici, API e conteggi, allineate
+        parti.append(intestazione('Vocabolario Ordinato (Feature) e Vettore Frequenze (BoW)'))
+        for gruppo in gruppi:
+            indici, parole, conteggi = zip(*gruppo)
+            parti += [riga(indici, '#ADD8E6'), riga(parole), riga(conteggi, '#FFC0CB')]
+    parti.append('</TABLE>>')
+    return ''.join(parti)
+
+def grafo_bow_pipeline(lista_parole: list, comprimi: bool = False, top_k: int | None = None,
+                       colonne_per_riga: int | None = None, max_nodi: int | None = None) -> graphviz.Digraph:
     """
     Crea un grafo orientato che visualizza l'intera pipeline Bag-of-Words,
     utilizzando indici numerici semplici e background trasparente.
+    Con comprimi le chiamate ripetute (anche a gruppi) diventano un solo nodo "×N".
+    Per sequenze e vocabolari reali: top_k e colonne_per_riga limitano e impaginano la tabella
+    (vedi _tabella_bow), max_nodi sostituisce i nodi in eccesso della sequenza con un nodo di riepilogo.
+    I nomi delle API vengono sottoposti a escape: le label sono HTML-like.
     """
+    if max_nodi is not None and max_nodi < 1:
+        raise ValueError(f"max_nodi deve essere almeno 1, non {max_nodi}")
     
     # 1. Calcolo del Vocabolario e del Vettore BoW
-    frequenze = Counter(lista_parole)
-    vocabolario_ordinato = sorted(frequenze.keys())
-    vettore_bow = [frequenze[parola] for parola in vocabolario_ordinato]
-    num_colonne = len(vocabolario_ordinato)
+    vettorizzatore = BowVectorizer().fit([lista_parole])
+    vocabolario_ordinato = vettorizzatore.vocabulary.tokens
+    vettore_bow = vettorizzatore.transform([lista_parole]).toarray()[0].tolist()
 
     # 2. Inizializzazione del Grafo
     dot = graphviz.Digraph(
         comment='Pipeline Bag-of-Words', 
         name='BoWPipelineGraph',
+        format='png',
         graph_attr={
             'rankdir': 'TB',
             'bgcolor':'transparent' 
@@ -65,10 +123,20 @@ def crea_grafo_bow_pipeline(lista_parole: list, nome_file: str = 'grafo_bow_pipe
         seq.attr('node', shape='box', style='filled', fillcolor='#DAF7A6') # Verde chiaro
         
         nodi_sequenza = {}
+        blocchi = compress(lista_parole) if comprimi else [Block((parola,), 1) for parola in lista_parole]
+        nascosti = []
+        if max_nodi is not None and len(blocchi) > max_nodi:
+            blocchi, nascosti = blocchi[:max_nodi - 1], blocchi[max_nodi - 1:]
+        inizio = 1
 
-        for i, parola in enumerate(lista_parole):
+        for i, blocco in enumerate(blocchi):
             node_id = f'seq_{i + 1}'
-            label = f'<{i + 1} | {parola}>' # Indice | Parola
+            if len(blocco) == 1:
+                label = f'<{inizio} | {escape(blocco.motif[0], quote=False)}>' # Indice | Parola
+            else:
+                # Intervallo di indici | Motivo ×Ripetizioni
+                label = f'<{inizio}-{inizio + len(blocco) - 1} | {" → ".join(escape(parola, quote=False) for parola in blocco.motif)} ×{blocco.repeat}>'
+            inizio += len(blocco)
             
             seq.node(name=node_id, label=label)
             nodi_sequenza[i] = node_id
@@ -76,6 +144,16 @@ def crea_grafo_bow_pipeline(lista_parole: list, nome_file: str = 'grafo_bow_pipe
             if i > 0:
                 nodo_precedente_id = nodi_sequenza[i - 1]
                 seq.edge(nodo_precedente_id, node_id)
+
+        if nascosti:
+            # Nodo di riepilogo al posto delle chiamate che non vengono disegnate
+            chiamate = sum(len(blocco) for blocco in nascosti)
+            distinte = len({parola for blocco in nascosti for parola in blocco.motif})
+            seq.node(name='seq_altre', label=f'<{inizio}-{inizio + chiamate - 1} | … altre {chiamate} chiamate ({distinte} distinte)>',
+                     style='filled,dashed')
+            if nodi_sequenza:
+                seq.edge(nodi_sequenza[len(nodi_sequenza) - 1], 'seq_altre')
+            nodi_sequenza[len(nodi_sequenza)] = 'seq_altre'
         
         if nodi_sequenza:
             nodo_inizio_sequenza = nodi_sequenza[0]
@@ -85,38 +163,9 @@ def crea_grafo_bow_pipeline(lista_parole: list, nome_file: str = 'grafo_bow_pipe
     with dot.subgraph(name='cluster_vettori_allineati') as vettori:
         vettori.attr(label='2. Mappatura e Vettore delle Caratteristiche (BoW)', style='rounded', bgcolor='transparent') # Cluster trasparente
         
-        # Costruzione di un'unica tabella HTML
-        tabella_allineata = '<<TABLE BORDER="0" CELLBORDER="1" CELLSPACING="0">'
-        
-        # Riga A: Intestazione Indici (Vocabolario) 
-        tabella_allineata += f'<TR><TD COLSPAN="{num_colonne}" BGCOLOR="#E6E6FA"><B>Vocabolario Ordinato (Feature)</B></TD></TR>'
-
-        # Riga B: Indici delle Feature (0, 1, 2, ...)
-        tabella_allineata += '<TR>'
-        for i in range(num_colonne):
-            tabella_allineata += f'<TD BGCOLOR="#ADD8E6"><B>{i}</B></TD>' 
-        tabella_allineata += '</TR>'
-        
-        # Riga C: Parole (API)
-        tabella_allineata += '<TR>'
-        for parola in vocabolario_ordinato:
-            tabella_allineata += f'<TD>{parola}</TD>'
-        tabella_allineata += '</TR>'
-        
-        # Riga D: Intestazione Vettore Frequenze
-        tabella_allineata += f'<TR><TD COLSPAN="{num_colonne}" BGCOLOR="#E6E6FA"><B>Vettore Frequenze (BoW)</B></TD></TR>'
-        
-        # Riga E: Vettore BoW (Conteggi)
-        tabella_allineata += '<TR>'
-        for conteggio in vettore_bow:
-            tabella_allineata += f'<TD BGCOLOR="#FFC0CB"><B>{conteggio}</B></TD>'
-        tabella_allineata += '</TR>'
-        
-        tabella_allineata += '</TABLE>>'
-        
         vettori.node(
             'vettori_node', 
-            label=tabella_allineata, 
+            label=_tabella_bow(vocabolario_ordinato, vettore_bow, top_k, colonne_per_riga),
             shape='none', 
             margin='0.1',
             fontname='Arial'
@@ -125,19 +174,57 @@ def crea_grafo_bow_pipeline(lista_parole: list, nome_file: str = 'grafo_bow_pipe
     # 5. Connessione logica: dalla sequenza ai vettori
     dot.edge(nodo_inizio_sequenza, 'vettori_node', label='Mappatura BoW', arrowhead='normal')
 
-    # 6. Rendering
-    dot.render(nome_file, format='png', view=False, cleanup=True) 
+    return dot
+
+def crea_grafo_bow_pipeline(lista_parole: list, nome_file: str = 'grafo_bow_pipeline_final', comprimi: bool = False,
+                            top_k: int | None = None, colonne_per_riga: int | None = None, max_nodi: int | None = None):
+    # 6. Rendering (graph/diagrams.py rigenera i diagrammi registrati solo se il sorgente è cambiato)
+    grafo_bow_pipeline(lista_parole, comprimi, top_k, colonne_per_riga, max_nodi).render(nome_file, cleanup=True)
     print(f"Generazione completata. Il file di output è '{nome_file}.png'.")
 
-def main():
-    output_file = Path(__file__).resolve().parent / "api_sequence"
+def esempio() -> list:
+    """La breve sequenza dimostrativa (con una chiamata ripetuta) usata per il diagramma della tesi."""
     tokens = data.replace('\n', '').split(',')
     size = 4
     apis = tokens[2: (size + 2)]
     apis.append(apis[2])
-    # matplot(apis, output_file)
-    crea_grafo_bow_pipeline(apis, str(output_file).removesuffix('.png'))
-    pass
+    return apis
+
+def diagrammi() -> list:
+    """Grafi da rigenerare con graph/diagrams.py, come coppie (Digraph, nome file)."""
+    return [(grafo_bow_pipeline(esempio()), "api_sequence")]
+
+def _positivo(valore: str) -> int:
+    numero = int(valore)
+    if numero < 1:
+        raise argparse.ArgumentTypeError(f"deve essere almeno 1, non {numero}")
+    return numero
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagramma della pipeline Bag-of-Words per una sequenza di API")
+    parser.add_argument("--sample", type=Path, help="JSON standardizzato da cui prendere la sequenza (default: esempio dimostrativo)")
+    parser.add_argument("--index", type=int, default=0, help="posizione dell'esempio nel file")
+    parser.add_argument("--output", type=Path, help="file di output senza estensione")
+    parser.add_argument("--comprimi", action="store_true", help="un nodo ×N per le chiamate ripetute")
+    parser.add_argument("--top-k", type=_positivo, help="mostra solo le k feature più frequenti")
+    parser.add_argument("--colonne", type=_positivo, help="colonne della tabella per riga")
+    parser.add_argument("--max-nodi", type=_positivo, help="nodi massimi della sequenza")
+    args = parser.parse_args()
+
+    if args.sample is None:
+        output_file = args.output or Path(__file__).resolve().parent / "api_sequence"
+        apis = esempio()
+        # matplot(apis, output_file)
+        crea_grafo_bow_pipeline(apis, str(output_file).removesuffix('.png'), args.comprimi, args.top_k, args.colonne, args.max_nodi)
+        return
+
+    from itertools import islice
+    from corpus import iter_samples
+    sample = next(islice(iter_samples(args.sample), args.index, None))
+    output_file = args.output or Path(f"{args.sample.stem}-{args.index}")
+    # Valori predefiniti pensati per sequenze e vocabolari reali
+    crea_grafo_bow_pipeline(sample.apis, str(output_file), args.comprimi, args.top_k or 30, args.colonne or 10, args.max_nodi or 40)
 
 if __name__ == "__main__":
+    use_dataset_modules()
     main()
\ No newline at end of file
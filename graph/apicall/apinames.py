@@ -0,0 +1,175 @@
+import argparse
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Iterable, NamedTuple
+import numpy as np
+from bow import INDEX_DTYPE, DATA_DTYPE, Vectorizer
+from shared import use_dataset_modules
+
+UNKNOWN = -1  # id delle API assenti da una tabella congelata
+AW_SUFFIX = re.compile(r"[a-z0-9][AW]$")  # CreateFileW, GetSystemDirectoryA, GetTextExtentPoint32W
+
+class Policy(NamedTuple):
+    """Regole di normalizzazione dei nomi delle API."""
+    lowercase: bool = True   # octack è tutto minuscolo: per confrontare i dataset serve lo stesso case
+    strip_dll: bool = True   # KERNEL32.GetSystemTimeAsFileTime -> GetSystemTimeAsFileTime
+    fold_aw: bool = True     # CreateFileA / CreateFileW -> CreateFile
+
+class _Lookup(dict):
+    """Nome grezzo -> id: i nomi già visti costano una ricerca in un dict, gli altri passano da resolve."""
+
+    def __init__(self, resolve):
+        super().__init__()
+        self.resolve = resolve
+
+    def __missing__(self, name: str) -> int:
+        value = self[name] = self.resolve(name)
+        return value
+
+class ApiTable:
+    """
+    Tabella di interning delle API: ogni nome viene ricondotto a una forma canonica
+    (policy) e questa a un id intero denso. I dataset diventano array int32 invece di
+    liste di stringhe. Una tabella congelata non aggiunge id: le API nuove valgono UNKNOWN.
+
+    La forma in minuscolo di octack (getsystemdirectorya) non permette di riconoscere
+    il suffisso A/W da sola: viene tolto solo se la base compare con A/W in un dataset
+    che conserva il case. Per questo conviene costruire la tabella con build su tutti i dataset.
+    """
+
+    def __init__(self, policy: Policy = Policy(), names: Iterable[str] = (), aw_bases: Iterable[str] = (), frozen: bool = False):
+        self.policy = policy
+        self.names: list[str] = list(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.aw_bases = set(aw_bases)
+        self.frozen = frozen
+        self._lookup = _Lookup(self._resolve)
+
+    @classmethod
+    def build(cls, names: Iterable[str], policy: Policy = Policy()) -> "ApiTable":
+        """
+        Tabella congelata sui nomi dati (anche da dataset diversi), con id in ordine alfabetico.
+        Le basi A/W vengono raccolte prima di normalizzare, così l'ordine dei dataset non conta.
+        """
+        distinct = set(names)
+        table = cls(policy)
+        for name in distinct:
+            table._learn(name)
+        canonical = sorted({table.canonical(name) for name in distinct})
+        return cls(policy, canonical, table.aw_bases, frozen=True)
+
+    def _learn(self, name: str):
+        name = self._strip(name)
+        if self.policy.fold_aw and AW_SUFFIX.search(name):
+            self.aw_bases.add(name[:-1].lower())
+
+    def _strip(self, name: str) -> str:
+        name = name.strip()
+        if self.policy.strip_dll:
+            # kernel32.dll!CreateFileW, KERNEL32.CreateFileW
+            name = name.rpartition("!")[2].rpartition(".")[2]
+        return name
+
+    def canonical(self, name: str) -> str:
+        name = self._strip(name)
+        if self.policy.fold_aw and name:
+            if AW_SUFFIX.search(name):
+                name = name[:-1]
+            elif name[-1] in "aw" and name.islower() and name[:-1] in self.aw_bases:
+                name = name[:-1]
+        return name.lower() if self.policy.lowercase else name
+
+    def _resolve(self, name: str) -> int:
+        canonical = self.canonical(name)
+        index = self.ids.get(canonical)
+        if index is None:
+            if self.frozen:
+                return UNKNOWN
+            index = self.ids[canonical] = len(self.names)
+            self.names.append(canonical)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def id(self, name: str) -> int:
+        return self._lookup[name]
+
+    def encode(self, sample: Iterable[str]) -> np.ndarray:
+        """Sequenza di API come array int32 di id (UNKNOWN per le API fuori da una tabella congelata)."""
+        if not isinstance(sample, (list, tuple)):
+            sample = list(sample)
+        return np.fromiter(map(self._lookup.__getitem__, sample), dtype=np.int32, count=len(sample))
+
+    def decode(self, ids: Iterable[int]) -> list[str]:
+        return [self.names[i] if i != UNKNOWN else "?" for i in ids]
+
+    def digest(self) -> str:
+        payload = json.dumps({"policy": self.policy._asdict(), "names": self.names, "aw_bases": sorted(self.aw_bases)})
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def save(self, path: Path):
+        with open(path, "w") as f:
+            json.dump({"policy": self.policy._asdict(), "aw_bases": sorted(self.aw_bases), "names": self.names}, f, indent=1)
+
+    @classmethod
+    def load(cls, path: Path) -> "ApiTable":
+        with open(path) as f:
+            table = json.load(f)
+        return cls(Policy(**table["policy"]), table["names"], table["aw_bases"], frozen=True)
+
+class InternedVectorizer(Vectorizer):
+    """
+    Bag-of-Words sugli id di una ApiTable congelata: le colonne sono gli id canonici,
+    i conteggi vengono fatti su array int32 con NumPy invece che su stringhe.
+    """
+
+    def __init__(self, table: ApiTable):
+        self.table = table
+        self.oov = 0
+
+    @property
+    def n_features(self) -> int:
+        return len(self.table)
+
+    def vectorize(self, sample) -> tuple[np.ndarray, np.ndarray]:
+        ids = sample if isinstance(sample, np.ndarray) else self.table.encode(sample)
+        known = ids[ids != UNKNOWN]
+        self.oov += len(ids) - len(known)
+        columns, counts = np.unique(known, return_counts=True)
+        return columns.astype(INDEX_DTYPE), counts.astype(DATA_DTYPE)
+
+    def merge(self, other: "InternedVectorizer"):
+        self.oov += other.oov
+
+    def fresh(self) -> "InternedVectorizer":
+        return InternedVectorizer(self.table)
+
+    def settings(self) -> dict:
+        return {"kind": "interned", "table": self.table.digest()}
+
+def main():
+    from corpus import iter_samples
+
+    parser = argparse.ArgumentParser(description="Tabella di interning delle API a partire da JSON standardizzati")
+    parser.add_argument("inputs", type=Path, nargs="+", help="JSON standardizzati ([{application_type, apis}])")
+    parser.add_argument("--output", type=Path, required=True, help="file JSON della tabella")
+    parser.add_argument("--keep-case", action="store_true", help="non convertire in minuscolo")
+    parser.add_argument("--keep-dll", action="store_true", help="non togliere il prefisso della DLL")
+    parser.add_argument("--keep-aw", action="store_true", help="non unire le varianti A/W")
+    args = parser.parse_args()
+
+    policy = Policy(lowercase=not args.keep_case, strip_dll=not args.keep_dll, fold_aw=not args.keep_aw)
+    distinct = set()
+    for path in args.inputs:
+        for sample in iter_samples(path):
+            distinct.update(sample.apis)
+    table = ApiTable.build(distinct, policy)
+    table.save(args.output)
+    print(f"{len(distinct)} nomi distinti -> {len(table)} API canoniche, tabella salvata in: {args.output}")
+
+if __name__ == "__main__":
+    use_dataset_modules()
+    main()
@@ -0,0 +1,397 @@
+import argparse
+import hashlib
+import json
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+import numpy as np
+
+Sample = Iterable[str]  # sequenza di chiamate API di un esempio
+
+DATA_DTYPE = np.int32     # conteggi
+INDEX_DTYPE = np.int32    # colonne (fino a 2^31 feature)
+INDPTR_DTYPE = np.int64   # offset delle righe (i non-zero totali possono superare 2^31)
+NPY_HEADER = 128          # spazio riservato all'intestazione .npy, scritta a fine stream
+
+class CsrMatrix(NamedTuple):
+    """
+    Matrice sparsa in formato CSR: la riga i ha colonne indices[indptr[i]:indptr[i + 1]]
+    e conteggi data[indptr[i]:indptr[i + 1]], con le colonne in ordine crescente.
+    Stessa disposizione di scipy.sparse.csr_matrix((data, indices, indptr), shape).
+    """
+    data: np.ndarray
+    indices: np.ndarray
+    indptr: np.ndarray
+    shape: tuple[int, int]
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indptr[-1])
+
+    def row(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def toarray(self) -> np.ndarray:
+        """Versione densa: solo per matrici piccole (diagrammi, controlli)."""
+        dense = np.zeros(self.shape, dtype=self.data.dtype)
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        dense[rows, self.indices] = self.data
+        return dense
+
+    def save(self, folder: Path):
+        """Salva la matrice in folder come data.npy, indices.npy, indptr.npy e meta.json."""
+        with CsrWriter(folder, self.shape[1]) as writer:
+            writer.write_block(self)
+
+    @classmethod
+    def load(cls, folder: Path, mmap: bool = True) -> "CsrMatrix":
+        """Carica una matrice salvata con save o CsrWriter; con mmap gli array restano su disco."""
+        folder = Path(folder)
+        mode = "r" if mmap else None
+        with open(folder / "meta.json") as f:
+            meta = json.load(f)
+        return cls(
+            data=np.load(folder / "data.npy", mmap_mode=mode),
+            indices=np.load(folder / "indices.npy", mmap_mode=mode),
+            indptr=np.load(folder / "indptr.npy", mmap_mode=mode),
+            shape=tuple(meta["shape"]),
+        )
+
+class _NpyStream:
+    """File .npy monodimensionale scritto in streaming: l'intestazione viene completata alla chiusura."""
+
+    def __init__(self, path: Path, dtype):
+        self.dtype = np.dtype(dtype)
+        self.f = open(path, "wb")
+        self.f.write(b"\0" * NPY_HEADER)
+        self.length = 0
+
+    def write(self, values: np.ndarray):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self.f.write(values.tobytes())
+        self.length += len(values)
+
+    def close(self):
+        self.f.seek(0)
+        np.lib.format.write_array_header_1_0(self.f, {
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (self.length,),
+        })
+        # L'intestazione di un array 1-D occupa sempre 128 byte (allineamento a 64)
+        assert self.f.tell() == NPY_HEADER
+        self.f.close()
+
+class CsrWriter:
+    """
+    Scrive una matrice CSR direttamente su disco, una riga alla volta:
+    in memoria resta solo indptr (8 byte per riga), non i non-zero.
+    """
+
+    def __init__(self, folder: Path, n_features: int):
+        self.folder = Path(folder)
+        self.n_features = n_features
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.data = _NpyStream(self.folder / "data.npy", DATA_DTYPE)
+        self.indices = _NpyStream(self.folder / "indices.npy", INDEX_DTYPE)
+        self.indptr = array("q", [0])
+
+    def write_row(self, indices: np.ndarray, counts: np.ndarray):
+        self.indices.write(indices)
+        self.data.write(counts)
+        self.indptr.append(self.indptr[-1] + len(indices))
+
+    def write_block(self, matrix: CsrMatrix):
+        """Accoda tutte le righe di una matrice (es. un blocco calcolato altrove)."""
+        self.indices.write(matrix.indices)
+        self.data.write(matrix.data)
+        self.indptr.frombytes((np.asarray(matrix.indptr[1:], dtype=INDPTR_DTYPE) + self.indptr[-1]).tobytes())
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.indptr) - 1, self.n_features
+
+    def close(self):
+        self.data.close()
+        self.indices.close()
+        np.save(self.folder / "indptr.npy", np.frombuffer(self.indptr, dtype=INDPTR_DTYPE))
+        with open(self.folder / "meta.json", "w") as f:
+            json.dump({"format": "csr", "shape": self.shape, "nnz": self.indptr[-1]}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CsrBuilder:
+    """Accumula righe CSR in memoria in array compatti (la memoria cresce con i non-zero)."""
+
+    def __init__(self, n_features: int):
+        self.n_features = n_features
+        self.data = array("i")
+        self.indices = array("i")
+        self.indptr = array("q", [0])
+
+    def write_row(self, indices: np.ndarray, counts: np.ndarray):
+        self.indices.frombytes(np.ascontiguousarray(indices, dtype=INDEX_DTYPE).tobytes())
+        self.data.frombytes(np.ascontiguousarray(counts, dtype=DATA_DTYPE).tobytes())
+        self.indptr.append(len(self.indices))
+
+    def write_block(self, matrix: CsrMatrix):
+        self.indices.frombytes(np.ascontiguousarray(matrix.indices, dtype=INDEX_DTYPE).tobytes())
+        self.data.frombytes(np.ascontiguousarray(matrix.data, dtype=DATA_DTYPE).tobytes())
+        offset = self.indptr[-1]
+        self.indptr.frombytes((np.asarray(matrix.indptr[1:], dtype=INDPTR_DTYPE) + offset).tobytes())
+
+    def build(self) -> CsrMatrix:
+        return CsrMatrix(
+            data=np.frombuffer(self.data, dtype=DATA_DTYPE),
+            indices=np.frombuffer(self.indices, dtype=INDEX_DTYPE),
+            indptr=np.frombuffer(self.indptr, dtype=INDPTR_DTYPE),
+            shape=(len(self.indptr) - 1, self.n_features),
+        )
+
+class Vocabulary:
+    """Vocabolario congelato: le API in ordine alfabetico, ognuna con il proprio indice di colonna."""
+
+    def __init__(self, tokens: Iterable[str]):
+        self.tokens = tuple(sorted(set(tokens)))
+        self.index = {token: i for i, token in enumerate(self.tokens)}
+
+    @classmethod
+    def fit(cls, samples: Iterable[Sample]) -> "Vocabulary":
+        """Un passaggio sugli esempi: in memoria resta solo l'insieme delle API distinte."""
+        distinct = set()
+        for sample in samples:
+            distinct.update(sample)
+        return cls(distinct)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def digest(self) -> str:
+        return hashlib.sha256("\n".join(self.tokens).encode()).hexdigest()
+
+    def save(self, path: Path):
+        """Un nome per riga, ogni riga terminata da \\n (newline="": nessuna traduzione dei fine riga)."""
+        if any("\n" in token for token in self.tokens):
+            raise ValueError(f"{path}: un nome di API contiene \\n e non può essere salvato una per riga")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write("".join(f"{token}\n" for token in self.tokens))
+
+    @classmethod
+    def load(cls, path: Path) -> "Vocabulary":
+        # Solo "\n" separa i nomi: splitlines spezzerebbe anche su \r, \x85, \u2028 e simili
+        with open(path, encoding="utf-8", newline="") as f:
+            tokens = f.read().split("\n")
+        if tokens[-1] == "":
+            tokens.pop()
+        return cls(tokens)
+
+class Vectorizer(ABC):
+    """Parte comune dei vettorizzatori: da esempi in streaming a righe CSR, in memoria o su disco."""
+
+    n_features: int
+
+    @abstractmethod
+    def vectorize(self, sample: Sample) -> tuple[np.ndarray, np.ndarray]:
+        """Colonne (ordinate) e valori della riga di un esempio."""
+
+    def merge(self, other: "Vectorizer"):
+        """Unisce lo stato raccolto da una copia del vettorizzatore (es. in un altro processo)."""
+
+    @abstractmethod
+    def fresh(self) -> "Vectorizer":
+        """Copia con gli stessi parametri ma senza statistiche accumulate, da mandare ai worker."""
+
+    @abstractmethod
+    def settings(self) -> dict:
+        """Parametri che determinano la matrice prodotta (usati come chiave di cache)."""
+
+    def transform(self, samples: Iterable[Sample]) -> CsrMatrix:
+        builder = CsrBuilder(self.n_features)
+        for sample in samples:
+            builder.write_row(*self.vectorize(sample))
+        return builder.build()
+
+    def transform_to(self, samples: Iterable[Sample], folder: Path) -> tuple[int, int]:
+        """Come transform, ma le righe finiscono direttamente su disco; restituisce la forma."""
+        with CsrWriter(folder, self.n_features) as writer:
+            for sample in samples:
+                writer.write_row(*self.vectorize(sample))
+        return writer.shape
+
+def _sorted_row(columns: list[int], counts: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    columns = np.array(columns, dtype=INDEX_DTYPE)
+    order = np.argsort(columns, kind="stable")
+    return columns[order], np.array(counts, dtype=DATA_DTYPE)[order]
+
+class BowVectorizer(Vectorizer):
+    """
+    Bag-of-Words sparso: ogni esempio diventa una riga di conteggi sulle colonne del vocabolario.
+    Gli esempi vengono letti in streaming; le API fuori vocabolario sono ignorate e contate in oov.
+    """
+
+    def __init__(self, vocabulary: Vocabulary | None = None):
+        self.vocabulary = vocabulary
+        self.oov = 0
+
+    def fit(self, samples: Iterable[Sample]) -> "BowVectorizer":
+        self.vocabulary = Vocabulary.fit(samples)
+        return self
+
+    def merge(self, other: "BowVectorizer"):
+        self.oov += other.oov
+
+    def fresh(self) -> "BowVectorizer":
+        return BowVectorizer(self.vocabulary)
+
+    def settings(self) -> dict:
+        # Senza vocabolario la matrice dipende solo dai dati: verrà costruito da questi
+        vocabulary = None if self.vocabulary is None else self.vocabulary.digest()
+        return {"kind": "bow", "vocabulary": vocabulary}
+
+    @property
+    def n_features(self) -> int:
+        return len(self.vocabulary)
+
+    def vectorize(self, sample: Sample) -> tuple[np.ndarray, np.ndarray]:
+        """Colonne (crescenti) e conteggi di un singolo esempio."""
+        index = self.vocabulary.index
+        # Counter conta in C: le ricerche nel vocabolario sono una per API distinta, non per chiamata
+        columns, counts = [], []
+        for token, count in Counter(sample).items():
+            column = index.get(token)
+            if column is None:
+                self.oov += count
+            else:
+                columns.append(column)
+                counts.append(count)
+        return _sorted_row(columns, counts)
+
+class HashingStats(NamedTuple):
+    tokens: int              # API distinte viste
+    columns: int             # colonne occupate
+    colliding_columns: int   # colonne condivise da più API
+    colliding_tokens: int    # API che condividono la colonna con almeno un'altra
+    expected_colliding_tokens: float  # valore atteso con un hash uniforme
+
+class HashingVectorizer(Vectorizer):
+    """
+    Feature hashing: ogni API va nella colonna crc32(api) % n_features, senza vocabolario.
+    Un solo passaggio sui dati, colonne stabili tra processi ed esecuzioni diverse
+    (a differenza di hash()), nuovi esempi vettorizzabili senza ricostruire nulla.
+    Con track_names tiene la mappa inversa colonna -> API, per le statistiche sulle collisioni
+    e per dare un nome alle feature nei grafici.
+    """
+
+    def __init__(self, n_features: int = 1 << 18, track_names: bool = True):
+        self.n_features = n_features
+        self.track_names = track_names
+        self._columns: dict[str, int] = {}  # cache: ogni API viene hashata una volta sola
+        self.names: dict[int, set[str]] = {}
+
+    def merge(self, other: "HashingVectorizer"):
+        self._columns.update(other._columns)
+        for column, names in other.names.items():
+            self.names.setdefault(column, set()).update(names)
+
+    def fresh(self) -> "HashingVectorizer":
+        return HashingVectorizer(self.n_features, self.track_names)
+
+    def settings(self) -> dict:
+        return {"kind": "hashing", "hash": "crc32", "n_features": self.n_features}
+
+    def column(self, token: str) -> int:
+        column = self._columns.get(token)
+        if column is None:
+            column = zlib.crc32(token.encode()) % self.n_features
+            self._columns[token] = column
+            if self.track_names:
+                self.names.setdefault(column, set()).add(token)
+        return column
+
+    def vectorize(self, sample: Sample) -> tuple[np.ndarray, np.ndarray]:
+        """Colonne (crescenti) e conteggi di un singolo esempio; le API in collisione si sommano."""
+        row: dict[int, int] = {}
+        for token, count in Counter(sample).items():
+            column = self.column(token)
+            row[column] = row.get(column, 0) + count
+        return _sorted_row(list(row), list(row.values()))
+
+    def stats(self) -> HashingStats:
+        """Collisioni tra le API viste finora (richiede track_names)."""
+        tokens = len(self._columns)
+        colliding = [names for names in self.names.values() if len(names) > 1]
+        # Probabilità che un'API condivida la colonna con almeno una delle altre tokens - 1
+        expected = tokens * (1 - (1 - 1 / self.n_features) ** max(tokens - 1, 0))
+        return HashingStats(
+            tokens=tokens,
+            columns=len(self.names),
+            colliding_columns=len(colliding),
+            colliding_tokens=sum(len(names) for names in colliding),
+            expected_colliding_tokens=expected,
+        )
+
+    def feature_names(self, columns: Iterable[int]) -> list[str]:
+        """Nome leggibile di ogni colonna: le API che vi finiscono, unite da "|"."""
+        return ["|".join(sorted(self.names.get(int(c), ()))) or f"#{int(c)}" for c in columns]
+
+    def save_names(self, path: Path):
+        """Sidecar JSON colonna -> API, da usare per etichettare le feature nei grafici."""
+        with open(path, "w") as f:
+            json.dump({
+                "n_features": self.n_features,
+                "hash": "crc32",
+                "columns": {str(c): sorted(names) for c, names in sorted(self.names.items())},
+            }, f, indent=1)
+
+    @classmethod
+    def load_names(cls, path: Path) -> "HashingVectorizer":
+        """Vettorizzatore con la mappa inversa salvata da save_names."""
+        with open(path) as f:
+            sidecar = json.load(f)
+        vectorizer = cls(sidecar["n_features"])
+        for column, names in sidecar["columns"].items():
+            vectorizer.names[int(column)] = set(names)
+            vectorizer._columns.update((name, int(column)) for name in names)
+        return vectorizer
+
+def iter_lines(path: Path) -> Iterator[list[str]]:
+    """Un esempio per riga, API separate da spazi (formato octak-calls.csv)."""
+    with open(path) as f:
+        for line in f:
+            yield line.split()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bag-of-Words sparso (CSR) da un file con un esempio per riga")
+    parser.add_argument("input", type=Path, help="file con le API di un esempio per riga, separate da spazi")
+    parser.add_argument("--output", type=Path, required=True, help="cartella in cui scrivere la matrice")
+    parser.add_argument("--vocabulary", type=Path, help="vocabolario esistente (una API per riga); altrimenti viene costruito")
+    parser.add_argument("--hashing", type=int, metavar="BITS",
+                        help="feature hashing su 2^BITS colonne invece del vocabolario (un solo passaggio)")
+    args = parser.parse_args()
+
+    if args.hashing:
+        vectorizer = HashingVectorizer(1 << args.hashing)
+        shape = vectorizer.transform_to(iter_lines(args.input), args.output)
+        vectorizer.save_names(args.output / "features.json")
+        stats = vectorizer.stats()
+        print(f"Matrice {shape[0]}x{shape[1]} salvata in: {args.output} "
+              f"(API: {stats.tokens}, in collisione: {stats.colliding_tokens}, attese: {stats.expected_colliding_tokens:.1f})")
+        return
+    if args.vocabulary:
+        vectorizer = BowVectorizer(Vocabulary.load(args.vocabulary))
+    else:
+        vectorizer = BowVectorizer().fit(iter_lines(args.input))
+    shape = vectorizer.transform_to(iter_lines(args.input), args.output)
+    vectorizer.vocabulary.save(args.output / "vocabulary.txt")
+    print(f"Matrice {shape[0]}x{shape[1]} salvata in: {args.output} (API fuori vocabolario: {vectorizer.oov})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import json
+import time
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+import numpy as np
+from bow import INDEX_DTYPE, INDPTR_DTYPE, Vocabulary, _NpyStream
+from corpus import Sample, sha256_or_none
+from shared import use_dataset_modules
+
+FORMAT_VERSION = 1
+LABEL_DTYPE = np.int16
+HASH_DTYPE = np.dtype("S64")
+REMAP_BLOCK = 1 << 24  # id riscritti per volta alla chiusura
+
+class ColumnarCorpus:
+    """
+    JSON standardizzato in forma binaria e colonnare (una cartella):
+    tokens.npy   id int32 di tutte le chiamate, esempio dopo esempio
+    offsets.npy  int64, le chiamate dell'esempio i sono tokens[offsets[i]:offsets[i + 1]]
+    labels.npy   int16, indice della classe di ogni esempio in meta.json["classes"]
+    sha256.npy   hash del PE in esadecimale (S64, vuoto se il dataset non lo fornisce): solo sha256
+                 validi in minuscolo (corpus.sha256_or_none), gli altri valori fanno fallire la scrittura
+    vocabulary.txt  nomi delle API in ordine alfabetico (quelli di bow.Vocabulary):
+                    l'id di una chiamata è anche la sua colonna BoW
+    Gli array vengono aperti in memory mapping, senza copiarli né decodificarli.
+    """
+
+    def __init__(self, tokens: np.ndarray, offsets: np.ndarray, labels: np.ndarray, vocabulary: Vocabulary, classes: list[str],
+                 hashes: np.ndarray | None = None):
+        self.tokens = tokens
+        self.offsets = offsets
+        self.labels = labels
+        self.hashes = hashes
+        self.vocabulary = vocabulary
+        self.classes = classes
+        self._names = np.array(vocabulary.tokens, dtype=object)
+
+    @classmethod
+    def load(cls, folder: Path, mmap: bool = True) -> "ColumnarCorpus":
+        folder = Path(folder)
+        meta = json.loads((folder / "meta.json").read_text())
+        if meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"{folder}: versione del formato {meta['format_version']}, attesa {FORMAT_VERSION}")
+        mode = "r" if mmap else None
+        return cls(
+            tokens=np.load(folder / "tokens.npy", mmap_mode=mode),
+            offsets=np.load(folder / "offsets.npy", mmap_mode=mode),
+            labels=np.load(folder / "labels.npy", mmap_mode=mode),
+            vocabulary=Vocabulary.load(folder / "vocabulary.txt"),
+            classes=meta["classes"],
+            hashes=np.load(folder / "sha256.npy", mmap_mode=mode) if (folder / "sha256.npy").exists() else None,
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def ids(self, i: int) -> np.ndarray:
+        """Id delle chiamate dell'esempio i (una vista, senza copia)."""
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    def label(self, i: int) -> str:
+        return self.classes[self.labels[i]]
+
+    def sha256(self, i: int) -> str | None:
+        return (self.hashes[i].decode() or None) if self.hashes is not None else None
+
+    def __getitem__(self, i: int) -> Sample:
+        return Sample(self.label(i), self._names[self.ids(i)].tolist(), self.sha256(i))
+
+    def __iter__(self) -> Iterator[Sample]:
+        for i in range(len(self)):
+            yield self[i]
+
+class CorpusWriter:
+    """
+    Scrive un ColumnarCorpus in streaming: le chiamate vanno direttamente su disco,
+    in memoria restano offset ed etichette (10 byte per esempio) e il vocabolario.
+    Gli id vengono assegnati in ordine di apparizione e alla chiusura rinumerati
+    in ordine alfabetico, riscrivendo tokens.npy a blocchi.
+    Con vocabulary e classes fissati (es. gli shard di un corpus unito) gli esempi arrivano
+    già codificati con write_ids e non serve rinumerare nulla.
+    """
+
+    def __init__(self, folder: Path, vocabulary: Vocabulary | None = None, classes: list[str] | None = None):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.tokens = _NpyStream(self.folder / "tokens.npy", INDEX_DTYPE)
+        self.hashes = _NpyStream(self.folder / "sha256.npy", HASH_DTYPE)
+        self.offsets = array("q", [0])
+        self.labels = array("h")
+        self.vocabulary = vocabulary
+        self.fixed_classes = classes
+        self.index: dict[str, int] = {} if vocabulary is None else vocabulary.index
+        self.classes: dict[str, int] = {} if classes is None else {c: i for i, c in enumerate(classes)}
+
+    def write(self, sample: Sample):
+        index = self.index
+        lookup = index.__getitem__ if self.vocabulary is not None else lambda api: index.setdefault(api, len(index))
+        ids = np.fromiter(map(lookup, sample.apis), dtype=INDEX_DTYPE, count=len(sample.apis))
+        self.write_ids(ids, sample.application_type, sample.sha256)
+
+    def write_ids(self, ids: np.ndarray, label: str, sha256: str | None = None):
+        """
+        Esempio già codificato (id del vocabolario fissato, o assegnati da write).
+        Uno sha256 che non sia già nella forma di sha256_or_none solleva ValueError: non verrebbe riletto uguale.
+        """
+        if sha256 is not None and sha256_or_none(sha256) != sha256:
+            raise ValueError(f"{self.folder}: sha256 non valido {sha256!r} (attese 64 cifre esadecimali minuscole)")
+        self.tokens.write(ids)
+        self.offsets.append(self.offsets[-1] + len(ids))
+        if self.fixed_classes is None:
+            self.labels.append(self.classes.setdefault(label, len(self.classes)))
+        else:
+            self.labels.append(self.classes[label])
+        self.hashes.write(np.array([sha256 or ""], dtype=HASH_DTYPE))
+
+    @property
+    def calls(self) -> int:
+        return self.offsets[-1]
+
+    def close(self):
+        self.tokens.close()
+        self.hashes.close()
+        vocabulary = self.vocabulary if self.vocabulary is not None else Vocabulary(self.index)
+        if self.tokens.length and self.vocabulary is None:
+            remap = np.empty(len(self.index), dtype=INDEX_DTYPE)
+            remap[list(self.index.values())] = [vocabulary.index[api] for api in self.index]
+            tokens = np.load(self.folder / "tokens.npy", mmap_mode="r+")
+            for start in range(0, len(tokens), REMAP_BLOCK):
+                tokens[start:start + REMAP_BLOCK] = remap[tokens[start:start + REMAP_BLOCK]]
+            tokens.flush()
+            del tokens
+        classes = sorted(self.classes) if self.fixed_classes is None else self.fixed_classes
+        label_remap = np.array([classes.index(c) for c in self.classes], dtype=LABEL_DTYPE)
+        np.save(self.folder / "offsets.npy", np.frombuffer(self.offsets, dtype=INDPTR_DTYPE))
+        np.save(self.folder / "labels.npy", label_remap[np.frombuffer(self.labels, dtype=LABEL_DTYPE)] if self.labels
+                else np.empty(0, dtype=LABEL_DTYPE))
+        vocabulary.save(self.folder / "vocabulary.txt")
+        (self.folder / "meta.json").write_text(json.dumps({
+            "format_version": FORMAT_VERSION,
+            "classes": classes,
+            "samples": len(self.labels),
+            "calls": self.offsets[-1],
+        }, indent=4))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def shards(path: Path) -> list[Path]:
+    """Cartelle dei corpus colonnari in path: path stesso, oppure i suoi shard part-* (merge.py)."""
+    path = Path(path)
+    return [path] if (path / "meta.json").exists() else sorted(p for p in path.glob("part-*") if p.is_dir())
+
+def pack(samples: Iterable[Sample], folder: Path) -> ColumnarCorpus:
+    with CorpusWriter(folder) as writer:
+        for sample in samples:
+            writer.write(sample)
+    return ColumnarCorpus.load(folder)
+
+def _size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) if path.is_dir() else path.stat().st_size
+
+def main():
+    from corpus import iter_samples, write_samples
+
+    parser = argparse.ArgumentParser(description="Conversione tra JSON standardizzato e corpus binario colonnare")
+    parser.add_argument("action", choices=["pack", "unpack"], help="pack: JSON -> cartella, unpack: cartella -> JSON")
+    parser.add_argument("input", type=Path, help="JSON standardizzato (pack) o cartella del corpus (unpack)")
+    parser.add_argument("output", type=Path, help="cartella del corpus (pack) o JSON standardizzato (unpack)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.action == "pack":
+        try:
+            corpora = [pack(iter_samples(args.input), args.output)]
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        # Anche un corpus unito da merge.py, diviso in shard
+        corpora = [ColumnarCorpus.load(folder) for folder in shards(args.input)]
+        if not corpora:
+            parser.error(f"{args.input}: nessun corpus colonnare (meta.json o shard part-*)")
+        write_samples(args.output, (sample for corpus in corpora for sample in corpus))
+    apis = {api for corpus in corpora for api in corpus.vocabulary.tokens}
+    print(f"{sum(map(len, corpora))} esempi, {sum(len(c.tokens) for c in corpora)} chiamate, {len(apis)} API distinte "
+          f"in {time.perf_counter() - start:.1f}s: {_size(args.input)} -> {_size(args.output)} byte")
+
+if __name__ == "__main__":
+    use_dataset_modules()
+    main()
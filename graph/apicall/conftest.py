@@ -0,0 +1,3 @@
+from shared import use_dataset_modules
+
+use_dataset_modules()
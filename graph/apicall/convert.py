@@ -0,0 +1,130 @@
+import argparse
+import csv
+import json
+import os
+import re
+from itertools import islice, zip_longest
+from pathlib import Path
+from typing import Iterator
+from corpus import Sample, sha256_or_none, write_samples
+from shard import _ordered_map
+
+# apimds: la prima parte del nome della famiglia (Trojan.Win32.FakeAV.rbzp) è la classe,
+# quelle non previste dal dataset ricadono in "malware" (malware non specializzati)
+APIMDS_CLASSES = {"backdoor", "downloader", "trojan", "virus", "packed"}
+# quovadis: cartelle report_<classe>, solo backdoor e clean (goodware) sono classi a sé
+QUOVADIS_CLASSES = {"backdoor": "backdoor", "clean": "goodware"}
+# octack: etichette al plurale
+OCTACK_ALIASES = {"worms": "worm"}
+# quovadis: chiavi cercate direttamente nel testo del report
+APIS_KEY = re.compile(rb'"apis"\s*:\s*\[')
+API_NAME = re.compile(rb'"api_name"\s*:\s*"([^"\\]*(?:\\.[^"\\]*)*)"')
+REPORTS_PER_JOB = 64  # report analizzati da un worker per ogni job
+
+def _csv_rows(path: Path) -> Iterator[list[str]]:
+    with open(path, newline="") as f:
+        yield from csv.reader(f)
+
+def read_apimds(path: Path) -> Iterator[Sample]:
+    """apimds: "famiglia","sha256","api",... per riga, senza intestazione."""
+    for row in _csv_rows(path):
+        if not row:
+            continue
+        family = row[0].split(".")[0].split("-")[-1].lower()
+        label = family if family in APIMDS_CLASSES else "malware"
+        yield Sample(label, [api for api in row[2:] if api], sha256_or_none(row[1]))
+
+def read_mpasco(path: Path) -> Iterator[Sample]:
+    """mpasco: intestazione sha256,labels,0,1,2,... e poi sha256,0|1,api,... (0 = goodware)."""
+    rows = _csv_rows(path)
+    next(rows, None)
+    for row in rows:
+        if not row:
+            continue
+        yield Sample("goodware" if row[1].strip() == "0" else "malware", [api for api in row[2:] if api], sha256_or_none(row[0]))
+
+def read_octack(path: Path, labels: Path) -> Iterator[Sample]:
+    """
+    octack: un esempio per riga con le API separate da spazi e, in un file a parte
+    (octak-labels.txt), un'etichetta per riga. I due file vengono letti in parallelo riga per riga.
+    """
+    with open(path) as calls, open(labels) as classes:
+        for i, (line, label) in enumerate(zip_longest(calls, classes), start=1):
+            if line is None or label is None:
+                raise ValueError(f"{path}: numero di righe diverso da {labels} (riga {i})")
+            label = label.strip().lower()
+            yield Sample(OCTACK_ALIASES.get(label, label), line.split())
+
+def read_quovadis_report(path: Path, label: str) -> list[Sample]:
+    """
+    Un report JSON di quovadis (<hash PE>.json): un oggetto (o un array di oggetti) con apis: [{api_name}, ...].
+    Il nome del file diventa lo sha256 degli esempi solo se è davvero uno sha256.
+    Invece di json.load, che costruirebbe un dict per ogni chiamata con tutti i suoi campi,
+    i valori di api_name vengono estratti dal testo con un'espressione regolare e assegnati
+    all'ultima chiave "apis" che li precede; solo gli esempi con nomi con escape passano da json.loads.
+    """
+    text = Path(path).read_bytes()
+    starts = [match.end() for match in APIS_KEY.finditer(text)]
+    if not starts:
+        raise ValueError(f"{path}: nessuna chiave \"apis\"")
+    sha256 = sha256_or_none(Path(path).stem)
+    samples = []
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        names = API_NAME.findall(text, start, end)
+        if any(b"\\" in name for name in names):
+            apis = [json.loads(b'"' + name + b'"') for name in names]
+        else:
+            # Una sola decodifica per tutto l'esempio
+            apis = b"\n".join(names).decode().split("\n") if names else []
+        samples.append(Sample(label, apis, sha256))
+    return samples
+
+def _read_reports(jobs: list[tuple[Path, str]]) -> list[Sample]:
+    return [sample for path, label in jobs for sample in read_quovadis_report(path, label)]
+
+def quovadis_reports(root: Path) -> Iterator[tuple[Path, str]]:
+    """(report, classe) per ogni <hash>.json nelle cartelle report_<classe>, in ordine."""
+    for folder in sorted(root.glob("report_*")):
+        if not folder.is_dir():
+            continue
+        name = folder.name.removeprefix("report_").lower()
+        label = QUOVADIS_CLASSES.get(name, "malware")
+        for report in sorted(folder.glob("*.json")):
+            yield report, label
+
+def read_quovadis(path: Path, workers: int | None = None) -> Iterator[Sample]:
+    """
+    quovadis: la cartella estratta dall'archivio, oppure un singolo report.
+    I report vengono analizzati a gruppi su un pool di processi (di default uno per core);
+    gli esempi arrivano nell'ordine di quovadis_reports, indipendentemente da workers.
+    """
+    if path.is_file():
+        yield from read_quovadis_report(path, "malware")
+        return
+    reports = quovadis_reports(path)
+    jobs = iter(lambda: list(islice(reports, REPORTS_PER_JOB)), [])
+    for samples in _ordered_map(_read_reports, jobs, workers or os.cpu_count() or 1):
+        yield from samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte un dataset grezzo nel JSON standardizzato ([{application_type, apis}])")
+    parser.add_argument("format", choices=["apimds", "mpasco", "octack", "quovadis"], help="formato del dataset")
+    parser.add_argument("input", type=Path, help="file del dataset (per quovadis la cartella con le cartelle report_<classe>)")
+    parser.add_argument("--labels", type=Path, help="solo octack: etichette, una per riga (octak-labels.txt)")
+    parser.add_argument("--output", type=Path, required=True, help="JSON standardizzato")
+    parser.add_argument("--workers", type=int, default=None, help="solo quovadis: processi per l'analisi dei report (default: uno per core)")
+    args = parser.parse_args()
+
+    if args.format == "octack":
+        if args.labels is None:
+            parser.error("octack richiede --labels")
+        samples = read_octack(args.input, args.labels)
+    elif args.format == "quovadis":
+        samples = read_quovadis(args.input, args.workers)
+    else:
+        samples = {"apimds": read_apimds, "mpasco": read_mpasco}[args.format](args.input)
+    count = write_samples(args.output, samples)
+    print(f"{count} esempi convertiti, salvati in: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import json
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+from runs import expand, from_json
+
+SHA256 = re.compile("[0-9a-f]{64}")
+
+class Sample(NamedTuple):
+    """
+    Un elemento del JSON standardizzato: classe del software e sequenza di chiamate API.
+    Nel formato compresso di runs.py le chiamate sono in "runs" e vengono espanse alla lettura.
+    sha256 è l'hash del PE, quando il dataset lo fornisce (nel JSON il campo è omesso se assente).
+    """
+    application_type: str
+    apis: list[str]
+    sha256: str | None = None
+
+def sha256_or_none(value: str | None) -> str | None:
+    """L'hash in minuscolo se è uno sha256 esadecimale (64 cifre), altrimenti None (es. nomi di file qualsiasi)."""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    return value if SHA256.fullmatch(value) else None
+
+def iter_samples(path: Path, chunk_size: int | None = None) -> Iterator[Sample]:
+    """
+    Scorre gli elementi del JSON standardizzato ([{"application_type": ..., "apis": [...]}, ...])
+    senza caricare tutto il file: in memoria resta solo l'esempio in corso di decodifica.
+    Una cartella viene letta come corpus binario colonnare (columnar.py), anche diviso in shard.
+    Il JSON viene letto con loader.py di graph/dataset (vedi shared.use_dataset_modules).
+    """
+    if Path(path).is_dir():
+        from columnar import ColumnarCorpus, shards
+        for folder in shards(path):
+            yield from ColumnarCorpus.load(folder)
+        return
+    from loader import CHUNK_SIZE, iter_items
+
+    for value in iter_items(path, chunk_size or CHUNK_SIZE):
+        apis = value["apis"] if "apis" in value else expand(from_json(value["runs"]))
+        yield Sample(value["application_type"], apis, value.get("sha256"))
+
+def _json_sample(sample: Sample) -> dict:
+    value = {"application_type": sample.application_type, "apis": sample.apis}
+    if sample.sha256 is not None:
+        value["sha256"] = sample.sha256
+    return value
+
+class SampleWriter:
+    """JSON standardizzato scritto un esempio alla volta, uno per riga (leggibile da iter_samples e da json.load)."""
+
+    def __init__(self, path: Path):
+        self.f = open(path, "w")
+        self.f.write("[")
+        self.count = 0
+
+    def write(self, sample: Sample):
+        self.f.write(("," if self.count else "") + "\n" + json.dumps(_json_sample(sample)))
+        self.count += 1
+
+    def close(self):
+        self.f.write("\n]\n")
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_samples(path: Path, samples: Iterable[Sample]) -> int:
+    """
+    Scrive gli esempi man mano che arrivano, senza tenere la lista in memoria.
+    Restituisce il numero di esempi scritti.
+    """
+    with SampleWriter(path) as writer:
+        for sample in samples:
+            writer.write(sample)
+    return writer.count
+
+if __name__ == "__main__":
+    print("This file it's not intended to be run")
+    exit(1)
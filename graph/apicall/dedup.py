@@ -0,0 +1,263 @@
+import argparse
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+import numpy as np
+from corpus import Sample, sha256_or_none
+from shared import use_dataset_modules
+
+FORMAT_VERSION = 1
+INDEX_VERSION = 2         # chiavi di DedupIndex: la 2 aggiunge le impronte di classe e traccia
+KEY_DTYPE = np.uint64     # chiave di 128 bit in due colonne; la prima vale 0 solo negli slot vuoti
+VALUE_DTYPE = np.int64    # sorgente, riga, gruppo
+MAX_LOAD = 0.5            # riempimento oltre il quale la tabella raddoppia
+
+class Location(NamedTuple):
+    """Dove è stato visto un esempio: corpus di origine, riga, gruppo di duplicati."""
+    source: int
+    row: int
+    group: int
+
+def _key(digest: bytes) -> tuple[int, int]:
+    """Primi 16 byte di un digest -> due uint64 (bit basso della prima forzato a 1: mai 0)."""
+    return int.from_bytes(digest[:8], "little") | 1, int.from_bytes(digest[8:16], "little")
+
+class HashIndex:
+    """
+    Tabella hash persistente a indirizzamento aperto (sondaggio lineare) su file .npy
+    aperti in memory mapping: lookup e inserimento sono O(1) e leggono solo gli slot toccati.
+    La capacità è una potenza di due e raddoppia oltre MAX_LOAD, reinserendo tutte le chiavi
+    con operazioni vettoriali.
+    """
+
+    def __init__(self, folder: Path, capacity: int = 1 << 16):
+        self.folder = Path(folder)
+        meta = self.folder / "meta.json"
+        if meta.exists():
+            info = json.loads(meta.read_text())
+            if info["format_version"] != FORMAT_VERSION:
+                raise ValueError(f"{self.folder}: versione del formato {info['format_version']}, attesa {FORMAT_VERSION}")
+            self.count = info["count"]
+            self.keys = np.load(self.folder / "keys.npy", mmap_mode="r+")
+            self.values = np.load(self.folder / "values.npy", mmap_mode="r+")
+        else:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            self.count = 0
+            self.keys, self.values = self._allocate(capacity)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.keys)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _allocate(self, capacity: int, suffix: str = "") -> tuple[np.ndarray, np.ndarray]:
+        open_memmap = np.lib.format.open_memmap
+        keys = open_memmap(self.folder / f"keys{suffix}.npy", mode="w+", dtype=KEY_DTYPE, shape=(capacity, 2))
+        values = open_memmap(self.folder / f"values{suffix}.npy", mode="w+", dtype=VALUE_DTYPE, shape=(capacity, 3))
+        return keys, values
+
+    def _slot(self, key: tuple[int, int]) -> int:
+        """Slot della chiave, oppure il primo slot vuoto in cui andrebbe inserita."""
+        mask = self.capacity - 1
+        slot = key[1] & mask
+        keys = self.keys
+        while True:
+            first = int(keys[slot, 0])
+            if first == 0 or (first == key[0] and int(keys[slot, 1]) == key[1]):
+                return slot
+            slot = (slot + 1) & mask
+
+    def get(self, digest: bytes) -> Location | None:
+        slot = self._slot(_key(digest))
+        if self.keys[slot, 0] == 0:
+            return None
+        return Location(*map(int, self.values[slot]))
+
+    def add(self, digest: bytes, location: Location) -> Location:
+        """Inserisce la chiave se nuova; restituisce la posizione registrata (la prima vista)."""
+        key = _key(digest)
+        slot = self._slot(key)
+        if self.keys[slot, 0] != 0:
+            return Location(*map(int, self.values[slot]))
+        self.keys[slot] = key
+        self.values[slot] = location
+        self.count += 1
+        if self.count > MAX_LOAD * self.capacity:
+            self._grow()
+        return location
+
+    def _grow(self):
+        used = self.keys[:, 0] != 0
+        keys, values = np.asarray(self.keys[used]), np.asarray(self.values[used])
+        capacity = 2 * self.capacity
+        new_keys, new_values = self._allocate(capacity, ".grow")
+        mask = np.uint64(capacity - 1)
+        slots = (keys[:, 1] & mask).astype(np.int64)
+        pending = np.arange(len(keys))
+        # Sondaggio lineare a turni: a ogni turno, per ogni slot libero conteso vince la prima chiave
+        while len(pending):
+            wanted = slots[pending]
+            free = new_keys[wanted, 0] == 0
+            _, first = np.unique(wanted[free], return_index=True)
+            winners = pending[free][first]
+            new_keys[slots[winners]] = keys[winners]
+            new_values[slots[winners]] = values[winners]
+            placed = np.zeros(len(keys), dtype=bool)
+            placed[winners] = True
+            pending = pending[~placed[pending]]
+            slots[pending] = (slots[pending] + 1) & (capacity - 1)
+        new_keys.flush()
+        new_values.flush()
+        del self.keys, self.values
+        for name in ("keys", "values"):
+            (self.folder / f"{name}.grow.npy").replace(self.folder / f"{name}.npy")
+        self.keys = np.load(self.folder / "keys.npy", mmap_mode="r+")
+        self.values = np.load(self.folder / "values.npy", mmap_mode="r+")
+
+    def flush(self):
+        self.keys.flush()
+        self.values.flush()
+        (self.folder / "meta.json").write_text(json.dumps({"format_version": FORMAT_VERSION, "count": self.count}))
+
+def fingerprint(apis: Iterable[str], label: str | None = None) -> bytes:
+    """
+    Impronta della traccia: due esempi con la stessa sequenza di chiamate hanno la stessa impronta.
+    Con label è l'impronta della coppia (classe, traccia), in uno spazio di chiavi separato (person).
+    """
+    if label is None:
+        return hashlib.blake2b("\n".join(apis).encode(), digest_size=16).digest()
+    return hashlib.blake2b("\n".join([label, *apis]).encode(), digest_size=16, person=b"label").digest()
+
+class DedupIndex:
+    """
+    Indice dei duplicati tra corpus: sha256 del PE -> posizione, e impronte della traccia -> posizione.
+    Un esempio è un duplicato se ha lo stesso sha256 (valido) di uno già visto oppure, solo se non ha hash,
+    la stessa traccia con la stessa classe: PE diversi, o classi diverse, con la stessa traccia non vengono scartati.
+    Ogni esempio appartiene a un gruppo: quello del primo esempio con lo stesso hash o la stessa traccia
+    (qualunque siano hash e classe), altrimenti un gruppo nuovo. I gruppi servono solo allo split,
+    per tenere dalla stessa parte tutti gli esempi con lo stesso comportamento.
+    """
+
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        self.hashes = HashIndex(self.folder / "sha256")
+        self.traces = HashIndex(self.folder / "traces")
+        meta = self.folder / "meta.json"
+        info = json.loads(meta.read_text()) if meta.exists() else {"version": INDEX_VERSION, "sources": [], "groups": 0}
+        if info.get("version", 1) != INDEX_VERSION:
+            raise ValueError(f"{self.folder}: indice in versione {info.get('version', 1)}, attesa {INDEX_VERSION}: va ricostruito")
+        self.sources: list[str] = info["sources"]
+        self.groups: int = info["groups"]
+
+    def source(self, name: str) -> int:
+        if name not in self.sources:
+            self.sources.append(name)
+        return self.sources.index(name)
+
+    def add(self, sample: Sample, source: int, row: int) -> tuple[Location, bool]:
+        """
+        Registra l'esempio; restituisce se è un duplicato e la sua posizione: quella della prima occorrenza
+        per un duplicato, altrimenti la propria (nel gruppo di un esempio con la stessa traccia, se c'è).
+        Gli sha256 non validi (vedi corpus.sha256_or_none) vengono trattati come assenti.
+        Con un indice riusato, un esempio già registrato nella stessa posizione (source, row) ritrova
+        sé stesso: non è un duplicato e conserva il suo gruppo.
+        """
+        sha256 = sha256_or_none(sample.sha256)
+        digest = bytes.fromhex(sha256) if sha256 else None
+        trace = fingerprint(sample.apis)
+        labelled = fingerprint(sample.apis, sample.application_type)
+        first = self.hashes.get(digest) if digest else self.traces.get(labelled)
+        # Indice riusato: la prima occorrenza può essere l'esempio stesso
+        duplicate = first is not None and (first.source, first.row) != (source, row)
+        if first is not None:
+            location = first
+        else:
+            same_trace = self.traces.get(trace)
+            location = Location(source, row, same_trace.group if same_trace is not None else self.groups)
+            if same_trace is None:
+                self.groups += 1
+        # Anche un duplicato registra le chiavi che mancano (hash noto con traccia nuova o viceversa)
+        if digest:
+            self.hashes.add(digest, location)
+        self.traces.add(trace, location)
+        self.traces.add(labelled, location)
+        return location, duplicate
+
+    def flush(self):
+        self.hashes.flush()
+        self.traces.flush()
+        (self.folder / "meta.json").write_text(json.dumps(
+            {"version": INDEX_VERSION, "sources": self.sources, "groups": self.groups}, indent=4))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+def drop_duplicates(samples: Iterable[Sample], index: DedupIndex, source: str) -> Iterator[Sample]:
+    """Gli esempi non ancora visti (in questo corpus o in quelli già indicizzati)."""
+    code = index.source(source)
+    for row, sample in enumerate(samples):
+        if not index.add(sample, code, row)[1]:
+            yield sample
+
+def split(samples: Iterable[Sample], index: DedupIndex, source: str, test_size: float = 0.2,
+          keep_duplicates: bool = False) -> Iterator[tuple[Sample, bool]]:
+    """
+    (esempio, è di test): la parte dipende solo dal gruppo, quindi è deterministica e
+    i duplicati, se tenuti, finiscono tutti dalla stessa parte (niente leakage tra train e test).
+    """
+    code = index.source(source)
+    threshold = int(test_size * (1 << 64))
+    for row, sample in enumerate(samples):
+        location, duplicate = index.add(sample, code, row)
+        if duplicate and not keep_duplicates:
+            continue
+        draw = int.from_bytes(hashlib.blake2b(location.group.to_bytes(8, "little"), digest_size=8).digest(), "little")
+        yield sample, draw < threshold
+
+def main():
+    from corpus import SampleWriter, iter_samples, write_samples
+
+    parser = argparse.ArgumentParser(description="Deduplica (e divide senza leakage) corpus standardizzati con un indice persistente")
+    parser.add_argument("inputs", type=Path, nargs="+", help="JSON standardizzati o corpus colonnari, nell'ordine di priorità")
+    parser.add_argument("--index", type=Path, required=True, help="cartella dell'indice (creata se assente, riusata se presente)")
+    parser.add_argument("--output", type=Path, help="cartella in cui scrivere i corpus deduplicati (<nome>.json)")
+    parser.add_argument("--test", type=float, help="frazione di test: scrive <nome>-train.json e <nome>-test.json")
+    parser.add_argument("--keep-duplicates", action="store_true", help="con --test tiene i duplicati, dalla stessa parte del primo")
+    args = parser.parse_args()
+    if args.output is None and args.test is not None:
+        parser.error("--test richiede --output")
+
+    with DedupIndex(args.index) as index:
+        for path in args.inputs:
+            counts = {"kept": 0, "total": 0}
+
+            def counted(samples):
+                for sample in samples:
+                    counts["total"] += 1
+                    yield sample
+
+            samples = counted(iter_samples(path))
+            if args.output is None:
+                counts["kept"] = sum(1 for _ in drop_duplicates(samples, index, path.stem))
+            elif args.test is None:
+                args.output.mkdir(parents=True, exist_ok=True)
+                counts["kept"] = write_samples(args.output / f"{path.stem}.json", drop_duplicates(samples, index, path.stem))
+            else:
+                args.output.mkdir(parents=True, exist_ok=True)
+                with SampleWriter(args.output / f"{path.stem}-train.json") as train, \
+                        SampleWriter(args.output / f"{path.stem}-test.json") as test:
+                    for sample, is_test in split(samples, index, path.stem, args.test, args.keep_duplicates):
+                        (test if is_test else train).write(sample)
+                counts["kept"] = train.count + test.count
+            print(f"{path}: {counts['total']} esempi, {counts['total'] - counts['kept']} duplicati scartati")
+    print(f"Indice: {len(index.hashes)} hash, {len(index.traces)} impronte di tracce, {index.groups} gruppi, salvato in: {args.index}")
+
+if __name__ == "__main__":
+    use_dataset_modules()
+    main()
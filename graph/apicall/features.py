@@ -0,0 +1,146 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from array import array
+from pathlib import Path
+from typing import NamedTuple
+import numpy as np
+from bow import BowVectorizer, CsrMatrix, HashingVectorizer, Vectorizer, Vocabulary
+from corpus import iter_samples
+from shared import use_dataset_modules
+
+CACHE_DIR = Path(__file__).resolve().parent / ".feature-cache"
+FORMAT_VERSION = 1
+DIGESTS_FILE = "digests.json"
+
+class CachedFeatures(NamedTuple):
+    """Feature di un dataset lette dalla cache: gli array sono mappati in memoria, non copiati."""
+    matrix: CsrMatrix
+    labels: np.ndarray   # int32, indice in classes per ogni riga
+    classes: list[str]
+    folder: Path
+
+    def vocabulary(self) -> Vocabulary | None:
+        path = self.folder / "vocabulary.txt"
+        return Vocabulary.load(path) if path.exists() else None
+
+class FeatureCache:
+    """
+    Cache su disco delle matrici BoW, una cartella per chiave: sha256 del file del dataset
+    più i parametri del vettorizzatore. Le voci vengono scritte in una cartella temporanea
+    e rinominate a lavoro finito, così processi concorrenti non leggono mai una voce a metà.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR):
+        self.root = Path(root)
+
+    # ----- Chiavi -----
+    def digest(self, path: Path) -> str:
+        """
+        sha256 del contenuto del file. L'hash viene ricordato insieme a dimensione e mtime:
+        finché il file non cambia, la partenza a caldo non lo rilegge.
+        """
+        path = Path(path).resolve()
+        stat = path.stat()
+        digests_file = self.root / DIGESTS_FILE
+        try:
+            with open(digests_file) as f:
+                digests = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            digests = {}
+        known = digests.get(str(path))
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            while block := f.read(1 << 20):
+                sha.update(block)
+        digests[str(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha.hexdigest()}
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = digests_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(digests, f, indent=1)
+        os.replace(tmp, digests_file)
+        return sha.hexdigest()
+
+    def key(self, path: Path, vectorizer: Vectorizer) -> str:
+        payload = json.dumps({"version": FORMAT_VERSION, "file": self.digest(path), "vectorizer": vectorizer.settings()},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    # ----- Lettura e scrittura -----
+    def get(self, path: Path, vectorizer: Vectorizer) -> CachedFeatures | None:
+        folder = self.root / self.key(path, vectorizer)
+        if not (folder / "meta.json").exists():
+            return None
+        features = _load(folder)
+        if isinstance(vectorizer, BowVectorizer) and vectorizer.vocabulary is None:
+            vectorizer.vocabulary = features.vocabulary()
+        return features
+
+    def build(self, path: Path, vectorizer: Vectorizer) -> CachedFeatures:
+        """Vettorizza il JSON standardizzato in streaming e salva matrice, etichette e vocabolario."""
+        key = self.key(path, vectorizer)
+        if isinstance(vectorizer, BowVectorizer) and vectorizer.vocabulary is None:
+            vectorizer.fit(sample.apis for sample in iter_samples(path))
+
+        tmp = self.root / f"{key}.{os.getpid()}.tmp"
+        classes: dict[str, int] = {}
+        labels = array("i")
+
+        def samples():
+            for sample in iter_samples(path):
+                labels.append(classes.setdefault(sample.application_type, len(classes)))
+                yield sample.apis
+
+        vectorizer.transform_to(samples(), tmp)
+        np.save(tmp / "labels.npy", np.frombuffer(labels, dtype=np.int32))
+        with open(tmp / "classes.json", "w") as f:
+            json.dump(list(classes), f)
+        if isinstance(vectorizer, BowVectorizer):
+            vectorizer.vocabulary.save(tmp / "vocabulary.txt")
+        elif isinstance(vectorizer, HashingVectorizer) and vectorizer.track_names:
+            vectorizer.save_names(tmp / "features.json")
+
+        folder = self.root / key
+        try:
+            os.replace(tmp, folder)
+        except OSError:
+            # Un altro processo ha già scritto la stessa voce: tengo la sua
+            shutil.rmtree(tmp)
+        return _load(folder)
+
+    def features(self, path: Path, vectorizer: Vectorizer) -> CachedFeatures:
+        return self.get(path, vectorizer) or self.build(path, vectorizer)
+
+def _load(folder: Path) -> CachedFeatures:
+    with open(folder / "classes.json") as f:
+        classes = json.load(f)
+    return CachedFeatures(
+        matrix=CsrMatrix.load(folder, mmap=True),
+        labels=np.load(folder / "labels.npy", mmap_mode="r"),
+        classes=classes,
+        folder=folder,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Matrice BoW di un JSON standardizzato, tramite la cache su disco")
+    parser.add_argument("input", type=Path, help="JSON standardizzato ([{application_type, apis}])")
+    parser.add_argument("--hashing", type=int, metavar="BITS", help="feature hashing su 2^BITS colonne invece del vocabolario")
+    parser.add_argument("--cache", type=Path, default=CACHE_DIR)
+    args = parser.parse_args()
+
+    vectorizer = HashingVectorizer(1 << args.hashing) if args.hashing else BowVectorizer()
+    start = time.perf_counter()
+    features = FeatureCache(args.cache).features(args.input, vectorizer)
+    elapsed = time.perf_counter() - start
+    print(f"Matrice {features.matrix.shape[0]}x{features.matrix.shape[1]}, {len(features.classes)} classi "
+          f"in {elapsed * 1000:.1f} ms: {features.folder}")
+
+if __name__ == "__main__":
+    use_dataset_modules()
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import json
+from pathlib import Path
+from typing import Iterable
+import numpy as np
+from apinames import ApiTable, UNKNOWN
+from corpus import iter_samples
+from shared import use_dataset_modules
+
+FLUSH_SIZE = 1 << 24  # transizioni accumulate prima di ridurle con np.unique
+
+class MarkovClassifier:
+    """
+    Un modello di Markov del primo ordine per classe sulle transizioni tra API (approccio di Amer e Zelinka):
+    un esempio viene assegnato alla classe con la massima log-verosimiglianza della sua sequenza
+    (massima verosimiglianza). Con prior=True si aggiunge il log della probabilità a priori di ogni classe,
+    stimata dalla frequenza degli esempi di addestramento (stima MAP): è disattivato di default.
+
+    Gli stati sono gli id di una ApiTable, più uno per le API sconosciute e uno di partenza
+    (la prima chiamata è una transizione da START: la distribuzione iniziale è inclusa).
+    I conteggi sono sparsi: chiavi ordinate classe * S^2 + precedente * S + successiva,
+    con lisciamento additivo alpha sulle transizioni mai viste.
+    """
+
+    def __init__(self, n_states: int, n_classes: int, alpha: float = 1.0, prior: bool = False):
+        self.unknown = n_states          # stato per UNKNOWN
+        self.start = n_states + 1        # stato iniziale
+        self.S = n_states + 2
+        self.n_classes = n_classes
+        self.alpha = alpha
+        self.prior = prior
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.documents = np.zeros(n_classes, dtype=np.int64)
+        self._pending: list[np.ndarray] = []
+        self._pending_size = 0
+
+    def _states(self, ids: np.ndarray) -> np.ndarray:
+        states = np.empty(len(ids) + 1, dtype=np.int64)
+        states[0] = self.start
+        states[1:] = ids
+        states[1:][ids == UNKNOWN] = self.unknown
+        return states
+
+    def _transitions(self, ids: np.ndarray) -> np.ndarray:
+        """Chiave precedente * S + successiva di ogni transizione della sequenza."""
+        states = self._states(np.asarray(ids))
+        return states[:-1] * self.S + states[1:]
+
+    # ----- Addestramento -----
+    def partial_fit(self, sequences: Iterable[np.ndarray], labels: Iterable[int]) -> "MarkovClassifier":
+        """Accumula le transizioni in streaming; le riduzioni avvengono a blocchi di FLUSH_SIZE chiavi."""
+        for ids, label in zip(sequences, labels):
+            self._pending.append(self._transitions(ids) + label * self.S * self.S)
+            self._pending_size += len(ids)
+            self.documents[label] += 1
+            if self._pending_size >= FLUSH_SIZE:
+                self._flush()
+        return self
+
+    def _flush(self):
+        if not self._pending:
+            return
+        keys = np.concatenate([self.keys, *self._pending])
+        weights = np.concatenate([self.counts, np.ones(len(keys) - len(self.keys), dtype=np.int64)])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=weights, minlength=len(self.keys)).astype(np.int64)
+        self._pending, self._pending_size = [], 0
+
+    def fit(self, sequences: Iterable[np.ndarray], labels: Iterable[int]) -> "MarkovClassifier":
+        self.partial_fit(sequences, labels)
+        return self.finalize()
+
+    def finalize(self) -> "MarkovClassifier":
+        """Chiude l'addestramento: totali per (classe, stato precedente) e probabilità a priori (usate solo con prior)."""
+        self._flush()
+        rows = self.keys // self.S  # classe * S + precedente
+        self.row_totals = np.bincount(rows, weights=self.counts, minlength=self.n_classes * self.S).reshape(self.n_classes, self.S)
+        self.log_prior = np.log((self.documents + 1) / (self.documents.sum() + self.n_classes))
+        return self
+
+    # ----- Classificazione -----
+    def log_likelihood(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Log-verosimiglianza (più log a priori, se prior) della sequenza per tutte le classi insieme.
+        Le transizioni distinte vengono cercate nelle chiavi ordinate con un solo searchsorted.
+        """
+        pairs, repeats = np.unique(self._transitions(ids), return_counts=True)
+        classes = np.arange(self.n_classes, dtype=np.int64)[:, None]
+        queries = classes * self.S * self.S + pairs[None, :]
+        index = np.minimum(np.searchsorted(self.keys, queries), len(self.keys) - 1)
+        found = self.keys[index] == queries if len(self.keys) else np.zeros(queries.shape, dtype=bool)
+        counts = np.where(found, self.counts[index] if len(self.keys) else 0, 0)
+        # Le transizioni possibili da uno stato sono S - 1 (START non è mai una destinazione)
+        totals = self.row_totals[:, pairs // self.S]
+        log_p = np.log(counts + self.alpha) - np.log(totals + self.alpha * (self.S - 1))
+        log_likelihood = log_p @ repeats
+        return log_likelihood + self.log_prior if self.prior else log_likelihood
+
+    def predict(self, sequences: Iterable[np.ndarray]) -> np.ndarray:
+        return np.array([np.argmax(self.log_likelihood(ids)) for ids in sequences], dtype=np.int64)
+
+def confusion_matrix(y_true: np.ndarray, y_pred: np.ndarray, n_classes: int) -> np.ndarray:
+    """Righe: classe reale, colonne: classe predetta (come in data.json)."""
+    return np.bincount(np.asarray(y_true) * n_classes + y_pred, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+def class_name(label: str):
+    """Etichetta di un dataset -> ClassName (Trojan -> trojan, Worms -> worm)."""
+    from model import ClassName
+
+    value = label.strip().lower()
+    if value not in ClassName.__members__ and value.endswith("s") and value[:-1] in ClassName.__members__:
+        value = value[:-1]
+    return ClassName(value)
+
+def report(dataset: str, classes: list, train_labels: np.ndarray, test_labels: np.ndarray, predicted: np.ndarray) -> dict:
+    """
+    Voce di data.json per il dataset con il solo classificatore Markov: conteggi per classe e matrice
+    di confusione. Le metriche vengono derivate dalla validazione di Datasets (vedi metrics.py).
+    """
+    from model import ClassifierName, Datasets
+
+    n = len(classes)
+    train, test = np.bincount(train_labels, minlength=n), np.bincount(test_labels, minlength=n)
+    entry = {
+        "classes": {c.value: {"test": int(test[i]), "eval": int(train[i])} for i, c in enumerate(classes)},
+        "classifiers": {
+            ClassifierName.Markov.value: {
+                "confusion_matrix": {
+                    "classes": [c.value for c in classes],
+                    "matrix": confusion_matrix(test_labels, predicted, n).tolist(),
+                },
+            },
+        },
+    }
+    return Datasets.model_validate({dataset: entry}).model_dump(mode="json")
+
+def main():
+    from model import DatasetName
+
+    parser = argparse.ArgumentParser(description="Classificatore di Markov per classe sulle transizioni tra API")
+    parser.add_argument("train", type=Path, help="JSON standardizzato di addestramento")
+    parser.add_argument("test", type=Path, help="JSON standardizzato di test")
+    parser.add_argument("--table", type=Path, required=True, help="tabella di interning (apinames.py)")
+    parser.add_argument("--dataset", choices=[d.value for d in DatasetName], required=True)
+    parser.add_argument("--alpha", type=float, default=1.0, help="lisciamento additivo")
+    parser.add_argument("--prior", action="store_true", help="aggiunge il log a priori delle classi (MAP invece di massima verosimiglianza)")
+    parser.add_argument("--output", type=Path, required=True, help="JSON con la voce del dataset nel formato di data.json")
+    args = parser.parse_args()
+
+    table = ApiTable.load(args.table)
+    # Le classi sono note solo leggendo i dati: due passaggi sul file di addestramento
+    classes = sorted({class_name(s.application_type) for s in iter_samples(args.train)}, key=lambda c: c.value)
+    if not classes:
+        parser.error(f"{args.train}: nessun esempio di addestramento")
+    code = {c: i for i, c in enumerate(classes)}
+
+    unseen: dict[str, int] = {}  # classi del test assenti dall'addestramento -> esempi saltati
+
+    def encoded(path: Path):
+        for sample in iter_samples(path):
+            label = class_name(sample.application_type)
+            if label not in code:
+                unseen[label.value] = unseen.get(label.value, 0) + 1
+                continue
+            yield table.encode(sample.apis), code[label]
+
+    model = MarkovClassifier(len(table), len(classes), args.alpha, args.prior)
+    train_labels = []
+    for ids, label in encoded(args.train):
+        model.partial_fit([ids], [label])
+        train_labels.append(label)
+    model.finalize()
+    test_labels, predicted = [], []
+    for ids, label in encoded(args.test):
+        test_labels.append(label)
+        predicted.append(np.argmax(model.log_likelihood(ids)))
+
+    for label, count in sorted(unseen.items()):
+        print(f"{args.test}: {count} esempi di classe {label}, assente dall'addestramento, saltati")
+    if not test_labels:
+        parser.error(f"{args.test}: nessun esempio di test con una classe vista in addestramento")
+    result = report(args.dataset, classes, np.array(train_labels, dtype=np.int64),
+                    np.array(test_labels, dtype=np.int64), np.array(predicted, dtype=np.int64))
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=4)
+    accuracy = result[args.dataset]["classifiers"]["Markov"]["global_accuracy"]
+    print(f"Accuratezza {accuracy:.4f} su {len(test_labels)} esempi, risultato salvato in: {args.output}")
+
+if __name__ == "__main__":
+    use_dataset_modules()
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import json
+import shutil
+from pathlib import Path
+from typing import Iterator, NamedTuple
+import numpy as np
+from apinames import ApiTable, Policy, UNKNOWN
+from bow import INDEX_DTYPE, Vocabulary
+from columnar import ColumnarCorpus, CorpusWriter, shards
+from corpus import Sample, iter_samples, sha256_or_none
+from dedup import DedupIndex
+from markov import class_name
+from shared import use_dataset_modules
+
+SHARD_CALLS = 1 << 26     # chiamate per shard (256 MiB di id int32)
+SHARD_SAMPLES = 1 << 20   # esempi per shard (offset ed etichette in memoria: ~10 MiB)
+
+class Source(NamedTuple):
+    """Un corpus da unire: nome del dataset (DatasetName) e JSON standardizzato o corpus colonnare."""
+    dataset: str
+    path: Path
+
+def source_names(path: Path) -> set[str]:
+    """
+    API distinte di un corpus: per un corpus colonnare sono i vocabolari degli shard (senza leggere le chiamate),
+    per un JSON serve un passaggio in streaming. In memoria resta solo il vocabolario.
+    """
+    if Path(path).is_dir():
+        return {name for folder in shards(path) for name in Vocabulary.load(folder / "vocabulary.txt").tokens}
+    names = set()
+    for sample in iter_samples(path):
+        names.update(sample.apis)
+    return names
+
+def encoded(path: Path, table: ApiTable, with_samples: bool = False) -> Iterator[tuple[np.ndarray, str, str | None, Sample | None]]:
+    """
+    (id nella tabella, etichetta, sha256, esempio) per ogni esempio del corpus, uno alla volta.
+    Per un corpus colonnare gli id vengono rimappati con un solo array (id locale -> id della tabella),
+    senza decodificare i nomi; l'esempio decodificato viene prodotto solo se richiesto (with_samples).
+    """
+    if not Path(path).is_dir():
+        for sample in iter_samples(path):
+            yield table.encode(sample.apis), sample.application_type, sample.sha256, sample
+        return
+    for folder in shards(path):
+        corpus = ColumnarCorpus.load(folder)
+        remap = table.encode(list(corpus.vocabulary.tokens))
+        for i in range(len(corpus)):
+            yield remap[corpus.ids(i)], corpus.label(i), corpus.sha256(i), corpus[i] if with_samples else None
+
+class ShardedWriter:
+    """
+    Corpus colonnare diviso in shard part-NNNNN, tutti con lo stesso vocabolario (i nomi della tabella)
+    e le stesse classi: si passa allo shard successivo oltre shard_calls chiamate o shard_samples esempi.
+    """
+
+    def __init__(self, folder: Path, vocabulary: Vocabulary, classes: list[str],
+                 shard_calls: int = SHARD_CALLS, shard_samples: int = SHARD_SAMPLES):
+        self.folder = Path(folder)
+        self.vocabulary = vocabulary
+        self.classes = classes
+        self.shard_calls = shard_calls
+        self.shard_samples = shard_samples
+        self.shards: list[str] = []
+        self.writer: CorpusWriter | None = None
+
+    def write(self, ids: np.ndarray, label: str, sha256: str | None = None):
+        writer = self.writer
+        if writer is None or writer.calls >= self.shard_calls or len(writer.labels) >= self.shard_samples:
+            self.close()
+            name = f"part-{len(self.shards):05d}"
+            self.shards.append(name)
+            writer = self.writer = CorpusWriter(self.folder / name, self.vocabulary, self.classes)
+        writer.write_ids(ids, label, sha256)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def merge(sources: list[Source], output: Path, policy: Policy = Policy(), index: DedupIndex | None = None,
+          shard_calls: int = SHARD_CALLS, shard_samples: int = SHARD_SAMPLES) -> dict:
+    """
+    Unisce i corpus in un solo corpus colonnare a shard in output, in due passaggi:
+    1. unione dei vocabolari nella tabella di interning (salvata in output/apis.json),
+    2. per ogni sorgente, rimappatura degli id e delle etichette (su ClassName), normalizzazione degli sha256
+       (quelli non validi diventano assenti, vedi corpus.sha256_or_none) e scrittura in streaming.
+    In memoria restano la tabella, l'esempio corrente e offset/etichette di uno shard,
+    qualunque sia la dimensione dei corpus. Con index i duplicati (anche tra sorgenti) vengono scartati.
+    Gli shard di un'unione precedente nella stessa cartella vengono cancellati prima di scrivere.
+    Restituisce il riepilogo salvato in output/merge.json.
+    """
+    from model import ClassName
+
+    output = Path(output)
+    if (output / "meta.json").exists():
+        raise ValueError(f"{output}: contiene già un corpus colonnare non diviso in shard")
+    if any(Path(source.path).resolve() == output.resolve() for source in sources):
+        raise ValueError(f"{output}: la cartella di output è anche una sorgente")
+    output.mkdir(parents=True, exist_ok=True)
+    # shards() legge tutte le cartelle part-*: quelle rimaste da un'unione più grande si sommerebbero a queste
+    for folder in shards(output):
+        shutil.rmtree(folder)
+    raw = set()
+    for source in sources:
+        raw |= source_names(source.path)
+    table = ApiTable.build(raw, policy)
+    table.save(output / "apis.json")
+    classes = sorted(c.value for c in ClassName)
+
+    summary = {"apis": {"raw": len(raw), "canonical": len(table)}, "sources": [], "shards": []}
+    del raw
+    with ShardedWriter(output, Vocabulary(table.names), classes, shard_calls, shard_samples) as writer:
+        for source in sources:
+            code = index.source(source.dataset) if index is not None else None
+            stats = {"dataset": source.dataset, "path": str(source.path), "samples": 0, "calls": 0, "duplicates": 0, "labels": {}}
+            labels = stats["labels"]  # etichetta della sorgente -> ClassName
+            for row, (ids, label, sha256, sample) in enumerate(encoded(source.path, table, index is not None)):
+                if index is not None and index.add(sample, code, row)[1]:
+                    stats["duplicates"] += 1
+                    continue
+                # La tabella è costruita su tutte le sorgenti: nessun id può essere UNKNOWN
+                assert not (ids == UNKNOWN).any()
+                if label not in labels:
+                    labels[label] = class_name(label).value
+                writer.write(ids.astype(INDEX_DTYPE, copy=False), labels[label], sha256_or_none(sha256))
+                stats["samples"] += 1
+                stats["calls"] += len(ids)
+            summary["sources"].append(stats)
+        summary["shards"] = writer.shards
+    summary["samples"] = sum(s["samples"] for s in summary["sources"])
+    summary["calls"] = sum(s["calls"] for s in summary["sources"])
+    (output / "merge.json").write_text(json.dumps(summary, indent=4))
+    return summary
+
+def main():
+    from model import DatasetName
+
+    parser = argparse.ArgumentParser(description="Unisce più dataset standardizzati in un unico corpus colonnare a shard")
+    parser.add_argument("sources", nargs="+", metavar="DATASET=PATH",
+                        help=f"dataset ({', '.join(d.value for d in DatasetName)}) e JSON standardizzato o corpus colonnare")
+    parser.add_argument("--output", type=Path, required=True, help="cartella del corpus unito (gli shard già presenti vengono sostituiti)")
+    parser.add_argument("--index", type=Path, help="indice dei duplicati (dedup.py): scarta i duplicati anche tra dataset")
+    parser.add_argument("--shard-calls", type=int, default=SHARD_CALLS, help="chiamate massime per shard")
+    parser.add_argument("--keep-case", action="store_true", help="non convertire in minuscolo")
+    parser.add_argument("--keep-dll", action="store_true", help="non togliere il prefisso della DLL")
+    parser.add_argument("--keep-aw", action="store_true", help="non unire le varianti A/W")
+    args = parser.parse_args()
+
+    sources = []
+    for value in args.sources:
+        dataset, _, path = value.partition("=")
+        if dataset not in DatasetName.__members__ or not path:
+            parser.error(f"sorgente non valida: {value} (atteso DATASET=PATH)")
+        sources.append(Source(dataset, Path(path)))
+    policy = Policy(lowercase=not args.keep_case, strip_dll=not args.keep_dll, fold_aw=not args.keep_aw)
+
+    try:
+        if args.index is None:
+            summary = merge(sources, args.output, policy, shard_calls=args.shard_calls)
+        else:
+            with DedupIndex(args.index) as index:
+                summary = merge(sources, args.output, policy, index, shard_calls=args.shard_calls)
+    except ValueError as e:
+        parser.error(str(e))
+    for stats in summary["sources"]:
+        print(f"{stats['dataset']}: {stats['samples']} esempi, {stats['calls']} chiamate, {stats['duplicates']} duplicati scartati")
+    print(f"{summary['apis']['raw']} API distinte -> {summary['apis']['canonical']} canoniche; "
+          f"{summary['samples']} esempi in {len(summary['shards'])} shard, salvati in: {args.output}")
+
+if __name__ == "__main__":
+    use_dataset_modules()
+    main()
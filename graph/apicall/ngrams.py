@@ -0,0 +1,159 @@
+import argparse
+import hashlib
+import shutil
+from pathlib import Path
+from typing import Iterable
+import numpy as np
+from bow import CsrBuilder, CsrMatrix, CsrWriter, DATA_DTYPE, INDEX_DTYPE, Vectorizer
+from apinames import ApiTable
+from shared import use_dataset_modules
+
+MULTIPLIER = np.uint64(0x100000001B3)  # primo di FNV-1a a 64 bit
+BLOCK_ROWS = 4096
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """Finalizzatore di murmur3: i bit bassi (usati dal modulo) dipendono da tutto l'hash."""
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    return h
+
+def window_hashes(ids: np.ndarray, n: int, gap: int = 1) -> np.ndarray:
+    """
+    Hash polinomiale (uint64) di ogni finestra ids[i], ids[i + gap], ..., ids[i + (n - 1) * gap].
+    Lo schema di Horner viene applicato a n viste traslate dell'intero array: è lo stesso hash
+    dell'aggiornamento rolling finestra per finestra, ma senza un ciclo Python per finestra
+    e senza costruire tuple. Con gap > 1 si ottengono gli skip-gram.
+    """
+    span = (n - 1) * gap
+    count = len(ids) - span
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    values = np.asarray(ids).astype(np.uint64) + np.uint64(1)  # UNKNOWN (-1) -> 0, nessun id vale 0
+    # Il seme distingue ordine e salto: (a, b) come bigramma e come skip-gram finiscono in colonne diverse
+    h = np.full(count, n * 1_000_003 + gap, dtype=np.uint64)
+    for j in range(n):
+        h = h * MULTIPLIER + values[j * gap: j * gap + count]
+    return _mix(h)
+
+class NgramVectorizer(Vectorizer):
+    """
+    N-grammi di API (ordini configurabili, skip-gram opzionali) sugli id di una ApiTable,
+    proiettati con l'hashing trick su n_features colonne. Durante lo streaming conta la
+    document frequency di ogni colonna; prune tiene solo le colonne con df >= min_df e
+    da quel momento i nuovi esempi vengono vettorizzati sulle sole colonne tenute.
+    """
+
+    def __init__(self, table: ApiTable | None = None, orders: Iterable[int] = (2, 3), skip: int = 0, n_features: int = 1 << 20):
+        self.table = table
+        self.orders = tuple(orders)
+        self.skip = skip
+        self.hash_features = n_features
+        self.df = np.zeros(n_features, dtype=np.int32)
+        self.documents = 0
+        self.remap: np.ndarray | None = None  # colonna hash -> colonna tenuta (-1 se scartata)
+        self.kept: np.ndarray | None = None
+
+    @property
+    def n_features(self) -> int:
+        return self.hash_features if self.kept is None else len(self.kept)
+
+    def columns(self, ids: np.ndarray) -> np.ndarray:
+        """Colonna hash di ogni n-gramma dell'esempio (con ripetizioni)."""
+        parts = [
+            window_hashes(ids, n, gap)
+            for n in self.orders
+            # gli skip-gram hanno senso solo dai bigrammi in su
+            for gap in (range(1, self.skip + 2) if n > 1 else (1,))
+        ]
+        return (np.concatenate(parts) % np.uint64(self.hash_features)).astype(INDEX_DTYPE)
+
+    def vectorize(self, sample) -> tuple[np.ndarray, np.ndarray]:
+        ids = sample if isinstance(sample, np.ndarray) else self.table.encode(sample)
+        columns, counts = np.unique(self.columns(ids), return_counts=True)
+        if self.remap is None:
+            self.df[columns] += 1
+            self.documents += 1
+            return columns, counts.astype(DATA_DTYPE)
+        columns = self.remap[columns]
+        keep = columns >= 0
+        return columns[keep], counts[keep].astype(DATA_DTYPE)
+
+    def merge(self, other: "NgramVectorizer"):
+        self.df += other.df
+        self.documents += other.documents
+
+    def fresh(self) -> "NgramVectorizer":
+        vectorizer = NgramVectorizer(self.table, self.orders, self.skip, self.hash_features)
+        vectorizer.remap, vectorizer.kept = self.remap, self.kept
+        return vectorizer
+
+    def settings(self) -> dict:
+        return {
+            "kind": "ngram",
+            "orders": list(self.orders),
+            "skip": self.skip,
+            "n_features": self.hash_features,
+            "table": None if self.table is None else self.table.digest(),
+            "kept": None if self.kept is None else hashlib.sha256(self.kept.tobytes()).hexdigest(),
+        }
+
+    def prune(self, matrix: CsrMatrix, min_df: int, output: Path | None = None,
+              block_rows: int = BLOCK_ROWS) -> CsrMatrix | tuple[int, int]:
+        """
+        Tiene le colonne con document frequency >= min_df e le rinumera in modo compatto.
+        La matrice (anche mappata da disco) viene riscritta a blocchi di righe, senza mai
+        ritokenizzare; con output il risultato finisce su disco e si restituisce la forma.
+        """
+        self.kept = np.flatnonzero(self.df >= min_df).astype(INDEX_DTYPE)
+        self.remap = np.full(self.hash_features, -1, dtype=INDEX_DTYPE)
+        self.remap[self.kept] = np.arange(len(self.kept), dtype=INDEX_DTYPE)
+
+        writer = CsrBuilder(len(self.kept)) if output is None else CsrWriter(output, len(self.kept))
+        rows = matrix.shape[0]
+        for start in range(0, rows, block_rows):
+            end = min(start + block_rows, rows)
+            indptr = np.asarray(matrix.indptr[start:end + 1])
+            lo, hi = indptr[0], indptr[-1]
+            # La rinumerazione è monotona: le colonne restano ordinate in ogni riga
+            columns = self.remap[matrix.indices[lo:hi]]
+            keep = columns >= 0
+            row_of = np.repeat(np.arange(end - start), np.diff(indptr))
+            lengths = np.bincount(row_of[keep], minlength=end - start)
+            writer.write_block(CsrMatrix(
+                data=np.asarray(matrix.data[lo:hi])[keep],
+                indices=columns[keep],
+                indptr=np.concatenate([[0], np.cumsum(lengths)]),
+                shape=(end - start, len(self.kept)),
+            ))
+        if output is None:
+            return writer.build()
+        writer.close()
+        return writer.shape
+
+def main():
+    from corpus import iter_samples
+
+    parser = argparse.ArgumentParser(description="Matrice sparsa di n-grammi di API da un JSON standardizzato")
+    parser.add_argument("input", type=Path, help="JSON standardizzato ([{application_type, apis}])")
+    parser.add_argument("--table", type=Path, required=True, help="tabella di interning (apinames.py)")
+    parser.add_argument("--output", type=Path, required=True, help="cartella in cui scrivere la matrice")
+    parser.add_argument("--orders", type=int, nargs="+", default=[2, 3], help="lunghezze degli n-grammi")
+    parser.add_argument("--skip", type=int, default=0, help="salto massimo tra API consecutive (skip-gram)")
+    parser.add_argument("--bits", type=int, default=20, help="2^BITS colonne hash prima della potatura")
+    parser.add_argument("--min-df", type=int, default=2, help="esempi minimi in cui un n-gramma deve comparire")
+    args = parser.parse_args()
+
+    table = ApiTable.load(args.table)
+    vectorizer = NgramVectorizer(table, args.orders, args.skip, 1 << args.bits)
+    raw = args.output / "unpruned"
+    vectorizer.transform_to((table.encode(sample.apis) for sample in iter_samples(args.input)), raw)
+    shape = vectorizer.prune(CsrMatrix.load(raw), args.min_df, args.output)
+    shutil.rmtree(raw)
+    np.save(args.output / "kept.npy", vectorizer.kept)
+    print(f"Matrice {shape[0]}x{shape[1]} salvata in: {args.output} "
+          f"({len(vectorizer.kept)} colonne su {np.count_nonzero(vectorizer.df)} con df >= {args.min_df})")
+
+if __name__ == "__main__":
+    use_dataset_modules()
+    main()
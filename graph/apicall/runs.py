@@ -0,0 +1,109 @@
+import argparse
+import json
+from pathlib import Path
+from typing import Hashable, Iterable, NamedTuple, Sequence
+import numpy as np
+from shared import use_dataset_modules
+
+MAX_PERIOD = 8  # lunghezza massima dei motivi ripetuti cercati
+
+class Block(NamedTuple):
+    """motif ripetuto repeat volte di seguito (un run semplice ha un motivo lungo 1)."""
+    motif: tuple
+    repeat: int
+
+    def __len__(self) -> int:
+        return len(self.motif) * self.repeat
+
+def _codes(sequence: Sequence[Hashable]) -> tuple[np.ndarray, list]:
+    """Sequenza -> codici interi e valori distinti, per confrontare le finestre con NumPy."""
+    if isinstance(sequence, np.ndarray):
+        values, codes = np.unique(sequence, return_inverse=True)
+        return codes, values.tolist()
+    index: dict = {}
+    codes = np.fromiter((index.setdefault(token, len(index)) for token in sequence), dtype=np.int64, count=len(sequence))
+    return codes, list(index)
+
+def _reach(codes: np.ndarray, period: int) -> np.ndarray:
+    """
+    reach[i] = numero di posizioni consecutive da i in poi con codes[j] == codes[j + period]:
+    da i parte una ripetizione in tandem di (reach[i] // period) + 1 copie del motivo lungo period.
+    """
+    n = len(codes)
+    reach = np.zeros(n + 1, dtype=np.int64)
+    if n <= period:
+        return reach
+    equal = codes[:-period] == codes[period:]
+    # Lunghezza della serie di True che parte da ogni posizione, calcolata da destra
+    positions = np.arange(len(equal))
+    stops = np.where(~equal, positions, len(equal))
+    next_stop = np.minimum.accumulate(stops[::-1])[::-1]
+    reach[:len(equal)] = next_stop - positions
+    return reach
+
+def compress(sequence: Sequence[Hashable], max_period: int = MAX_PERIOD) -> list[Block]:
+    """
+    Codifica run-length con motivi ripetuti: a ogni posizione sceglie, tra i periodi 1..max_period,
+    la ripetizione in tandem che copre più chiamate (a parità, il motivo più corto).
+    I confronti tra finestre sono vettorizzati per periodo; la scelta greedy è lineare nella lunghezza.
+    """
+    codes, values = _codes(sequence)
+    n = len(codes)
+    reaches = [_reach(codes, p) for p in range(1, max_period + 1)]
+    blocks = []
+    i = 0
+    while i < n:
+        best_period, best_repeat = 1, 1
+        for period, reach in enumerate(reaches, start=1):
+            repeat = reach[i] // period + 1
+            if repeat > 1 and period * repeat > best_period * best_repeat:
+                best_period, best_repeat = period, int(repeat)
+        blocks.append(Block(tuple(values[c] for c in codes[i:i + best_period]), best_repeat))
+        i += best_period * best_repeat
+    return blocks
+
+def expand(blocks: Sequence[Block]) -> list:
+    sequence = []
+    for motif, repeat in blocks:
+        sequence.extend(motif * repeat)
+    return sequence
+
+def to_json(blocks: Sequence[Block]) -> list:
+    """Forma su disco: [[motivo, ripetizioni], ...]."""
+    return [[list(motif), repeat] for motif, repeat in blocks]
+
+def from_json(runs: list) -> list[Block]:
+    return [Block(tuple(motif), repeat) for motif, repeat in runs]
+
+def write_runs(path: Path, samples: Iterable, max_period: int = MAX_PERIOD) -> tuple[int, int]:
+    """Scrive gli esempi (corpus.Sample) compressi, uno per riga; restituisce (chiamate, blocchi)."""
+    calls = blocks = 0
+    with open(path, "w") as f:
+        f.write("[")
+        for i, sample in enumerate(samples):
+            runs = compress(sample.apis, max_period)
+            calls += len(sample.apis)
+            blocks += len(runs)
+            value = {"application_type": sample.application_type, "runs": to_json(runs)}
+            if sample.sha256 is not None:
+                value["sha256"] = sample.sha256
+            f.write(("," if i else "") + "\n" + json.dumps(value))
+        f.write("\n]\n")
+    return calls, blocks
+
+def main():
+    from corpus import iter_samples
+
+    parser = argparse.ArgumentParser(description="Comprime un JSON standardizzato con run-length e motivi ripetuti")
+    parser.add_argument("input", type=Path, help="JSON standardizzato ([{application_type, apis}])")
+    parser.add_argument("--output", type=Path, required=True, help="JSON compresso ([{application_type, runs}])")
+    parser.add_argument("--max-period", type=int, default=MAX_PERIOD, help="lunghezza massima dei motivi")
+    args = parser.parse_args()
+
+    calls, blocks = write_runs(args.output, iter_samples(args.input), args.max_period)
+    print(f"{calls} chiamate -> {blocks} blocchi ({calls / max(blocks, 1):.1f}x), "
+          f"{args.input.stat().st_size} -> {args.output.stat().st_size} byte")
+
+if __name__ == "__main__":
+    use_dataset_modules()
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple
+from bow import BowVectorizer, CsrMatrix, CsrWriter, HashingVectorizer, Vocabulary, CsrBuilder, Vectorizer
+
+CHUNK_SIZE = 32 << 20  # byte per shard: abbastanza per ammortizzare il pickling, pochi per la memoria
+
+class Shard(NamedTuple):
+    path: Path
+    start: int  # primo byte (inizio di una riga)
+    end: int    # byte successivo all'ultimo '\n' del blocco
+
+def byte_ranges(path: Path, chunk_size: int = CHUNK_SIZE, min_shards: int = 1) -> list[Shard]:
+    """
+    Divide il file in intervalli di byte di circa chunk_size, allineati all'inizio di una riga:
+    ogni riga (esempio) appartiene a uno e un solo shard, e l'ordine degli shard è quello del file.
+    """
+    size = os.path.getsize(path)
+    count = max(min_shards, -(-size // chunk_size), 1)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, count):
+            # Dal byte precedente al confine nominale fino alla fine della riga in corso
+            f.seek(max(size * i // count - 1, bounds[-1]))
+            f.readline()
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return [Shard(Path(path), start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def _read_lines(shard: Shard) -> list[str]:
+    with open(shard.path, "rb") as f:
+        f.seek(shard.start)
+        text = f.read(shard.end - shard.start).decode()
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()  # '\n' finale: nessuna riga vuota in più
+    return lines
+
+def _distinct(shard: Shard) -> set[str]:
+    distinct = set()
+    for line in _read_lines(shard):
+        distinct.update(line.split())
+    return distinct
+
+def _vectorize(job: tuple[Shard, Vectorizer]) -> tuple[CsrMatrix, Vectorizer]:
+    shard, vectorizer = job
+    vectorizer = vectorizer.fresh()  # anche senza pool: ogni shard restituisce solo il proprio stato
+    builder = CsrBuilder(vectorizer.n_features)
+    for line in _read_lines(shard):
+        builder.write_row(*vectorizer.vectorize(line.split()))
+    # Il vettorizzatore torna indietro con lo stato raccolto nel worker (oov, nomi delle colonne)
+    return builder.build(), vectorizer
+
+def _ordered_map(function: Callable, jobs: list, workers: int) -> Iterator:
+    """
+    Come pool.map, ma con al più 2 * workers shard in volo: i risultati arrivano nell'ordine
+    dei job e la memoria non cresce con la dimensione del file.
+    """
+    if workers == 1:
+        yield from map(function, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(function, job))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def fit_vocabulary(path: Path, workers: int | None = None, chunk_size: int = CHUNK_SIZE) -> Vocabulary:
+    """Vocabolario del file, con le API distinte raccolte in parallelo shard per shard."""
+    workers = workers or os.cpu_count() or 1
+    distinct = set()
+    for part in _ordered_map(_distinct, byte_ranges(path, chunk_size, workers), workers):
+        distinct |= part
+    return Vocabulary(distinct)
+
+def read_labels(path: Path) -> list[str]:
+    """Un'etichetta per riga (formato octak-labels.txt)."""
+    with open(path) as f:
+        return [line.strip() for line in f]
+
+def vectorize_file(path: Path, vectorizer: Vectorizer, output: Path | None = None, labels: list[str] | None = None,
+                   workers: int | None = None, chunk_size: int = CHUNK_SIZE) -> CsrMatrix | tuple[int, int]:
+    """
+    Vettorizza un file con un esempio per riga (API separate da spazi) su un pool di processi.
+    I blocchi CSR parziali vengono uniti nell'ordine del file: la riga i corrisponde alla riga i
+    di input, e quindi a labels[i]. Con output la matrice viene scritta su disco e si restituisce la forma.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Ai worker va una copia senza statistiche (pickle leggero); il loro stato viene poi unito a vectorizer
+    template = vectorizer.fresh()
+    jobs = [(shard, template) for shard in byte_ranges(path, chunk_size, workers)]
+    blocks = _ordered_map(_vectorize, jobs, workers)
+
+    def merge(write_block) -> int:
+        rows = 0
+        for block, state in blocks:
+            write_block(block)
+            vectorizer.merge(state)
+            rows += block.shape[0]
+        return rows
+
+    if output is None:
+        builder = CsrBuilder(vectorizer.n_features)
+        rows = merge(builder.write_block)
+        result = builder.build()
+    else:
+        with CsrWriter(output, vectorizer.n_features) as writer:
+            rows = merge(writer.write_block)
+        result = writer.shape
+    if labels is not None and rows != len(labels):
+        raise ValueError(f"{path}: {rows} esempi ma {len(labels)} etichette")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Bag-of-Words sparso in parallelo su file con un esempio per riga")
+    parser.add_argument("input", type=Path, help="file con le API di un esempio per riga (es. octak-calls.csv)")
+    parser.add_argument("--labels", type=Path, help="etichette, una per riga, allineate all'input (es. octak-labels.txt)")
+    parser.add_argument("--output", type=Path, required=True, help="cartella in cui scrivere la matrice")
+    parser.add_argument("--hashing", type=int, metavar="BITS", help="feature hashing su 2^BITS colonne invece del vocabolario")
+    parser.add_argument("--workers", type=int, help="processi (default: uno per core)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="byte per shard")
+    args = parser.parse_args()
+
+    labels = read_labels(args.labels) if args.labels else None
+    if args.hashing:
+        vectorizer = HashingVectorizer(1 << args.hashing)
+    else:
+        vectorizer = BowVectorizer(fit_vocabulary(args.input, args.workers, args.chunk_size))
+    shape = vectorize_file(args.input, vectorizer, args.output, labels, args.workers, args.chunk_size)
+    if args.hashing:
+        vectorizer.save_names(args.output / "features.json")
+    else:
+        vectorizer.vocabulary.save(args.output / "vocabulary.txt")
+    print(f"Matrice {shape[0]}x{shape[1]} salvata in: {args.output}")
+
+if __name__ == "__main__":
+    main()
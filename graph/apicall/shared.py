@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+# Moduli condivisi con graph/dataset: lo schema dei risultati (model.py) e il lettore JSON in streaming (loader.py)
+DATASET_DIR = Path(__file__).resolve().parent.parent / "dataset"
+
+def use_dataset_modules():
+    """
+    Rende importabili i moduli di graph/dataset. La chiamano i punti di ingresso (gli script
+    di questa cartella e conftest.py per i test), mai i moduli di libreria al momento dell'import.
+    """
+    if str(DATASET_DIR) not in sys.path:
+        sys.path.append(str(DATASET_DIR))
+
+if __name__ == "__main__":
+    print("This file it's not intended to be run")
+    exit(1)
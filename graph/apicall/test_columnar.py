@@ -0,0 +1,56 @@
+import random
+import pytest
+from bow import Vocabulary
+from columnar import ColumnarCorpus, pack
+from corpus import Sample, iter_samples, write_samples
+
+# Nomi che splitlines spezzerebbe, oltre a nomi qualsiasi
+NAMES = [f"Api{i}" for i in range(40)] + ["kernel32.CreateFileW", "é", "a\rb", "a\x85b", "a b", "a\x0cb", ""]
+
+def synthetic(count: int = 300, seed: int = 0) -> list[Sample]:
+    """Tracce vuote comprese, sha256 presenti e assenti, classi in ordine sparso."""
+    rng = random.Random(seed)
+    return [
+        Sample(rng.choice(["trojan", "goodware", "backdoor"]), rng.choices(NAMES, k=rng.randint(0, 50)),
+               f"{rng.getrandbits(256):064x}" if i % 3 else None)
+        for i in range(count)
+    ]
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_pack_load(tmp_path, mmap):
+    samples = synthetic()
+    pack(samples, tmp_path / "corpus")
+    corpus = ColumnarCorpus.load(tmp_path / "corpus", mmap=mmap)
+    assert list(corpus) == samples
+    assert list(corpus.vocabulary.tokens) == sorted({api for s in samples for api in s.apis})
+    assert corpus.classes == sorted({s.application_type for s in samples})
+
+def test_unpack_rewrites_the_same_json(tmp_path):
+    write_samples(tmp_path / "corpus.json", synthetic())
+    pack(iter_samples(tmp_path / "corpus.json"), tmp_path / "corpus")
+    write_samples(tmp_path / "unpacked.json", iter_samples(tmp_path / "corpus"))
+    assert (tmp_path / "unpacked.json").read_bytes() == (tmp_path / "corpus.json").read_bytes()
+
+def test_empty(tmp_path):
+    assert len(pack([], tmp_path / "empty")) == 0
+    assert list(iter_samples(tmp_path / "empty")) == []
+
+def test_shards_are_read_in_order(tmp_path):
+    first, second = synthetic(50, seed=1), synthetic(70, seed=2)
+    pack(first, tmp_path / "merged" / "part-00000")
+    pack(second, tmp_path / "merged" / "part-00001")
+    assert list(iter_samples(tmp_path / "merged")) == first + second
+
+@pytest.mark.parametrize("sha256", ["report_0001", "A" * 64, " " + "a" * 64, ""])
+def test_invalid_sha256_is_rejected(tmp_path, sha256):
+    with pytest.raises(ValueError):
+        pack([Sample("trojan", ["Api0"], sha256)], tmp_path / "corpus")
+
+def test_vocabulary_round_trip(tmp_path):
+    vocabulary = Vocabulary(NAMES)
+    vocabulary.save(tmp_path / "vocabulary.txt")
+    assert Vocabulary.load(tmp_path / "vocabulary.txt").tokens == vocabulary.tokens
+    (tmp_path / "manual.txt").write_text("Api0\nApi1")
+    assert Vocabulary.load(tmp_path / "manual.txt").tokens == ("Api0", "Api1")
+    with pytest.raises(ValueError):
+        Vocabulary(["a\nb"]).save(tmp_path / "newline.txt")
@@ -0,0 +1,46 @@
+import random
+from corpus import Sample
+from dedup import DedupIndex, drop_duplicates, split
+
+def synthetic(count: int = 200, seed: int = 0) -> list[Sample]:
+    """Esempi con e senza sha256, più alcune copie esatte (stesso hash o stessa classe e traccia)."""
+    rng = random.Random(seed)
+    names = [f"Api{i}" for i in range(20)]
+    samples = [
+        Sample(rng.choice(["trojan", "worm"]), rng.choices(names, k=rng.randint(5, 30)),
+               f"{rng.getrandbits(256):064x}" if i % 2 else None)
+        for i in range(count)
+    ]
+    return samples + samples[:count // 10]
+
+def test_drop_duplicates(tmp_path):
+    samples = synthetic()
+    with DedupIndex(tmp_path / "index") as index:
+        kept = list(drop_duplicates(samples, index, "a"))
+    assert kept == samples[:200]
+
+def test_reused_index_keeps_the_same_samples(tmp_path):
+    samples = synthetic()
+    with DedupIndex(tmp_path / "index") as index:
+        first = list(drop_duplicates(samples, index, "a"))
+    with DedupIndex(tmp_path / "index") as index:
+        again = list(drop_duplicates(samples, index, "a"))
+    assert again == first
+
+def test_reused_index_gives_the_same_split(tmp_path):
+    samples = synthetic()
+    with DedupIndex(tmp_path / "index") as index:
+        first = list(split(samples, index, "a", test_size=0.3))
+        groups = index.groups
+    assert any(is_test for _, is_test in first) and not all(is_test for _, is_test in first)
+    with DedupIndex(tmp_path / "index") as index:
+        again = list(split(samples, index, "a", test_size=0.3))
+        assert index.groups == groups
+    assert again == first
+
+def test_other_source_is_a_duplicate(tmp_path):
+    samples = synthetic()
+    with DedupIndex(tmp_path / "index") as index:
+        list(drop_duplicates(samples, index, "a"))
+    with DedupIndex(tmp_path / "index") as index:
+        assert list(drop_duplicates(samples, index, "b")) == []
@@ -0,0 +1,59 @@
+import os
+import random
+import numpy as np
+import pytest
+from bow import BowVectorizer, HashingVectorizer
+from corpus import Sample, write_samples
+from features import FeatureCache
+
+NAMES = [f"Api{i}" for i in range(30)]
+
+def write(path, count: int, seed: int = 0) -> list[Sample]:
+    rng = random.Random(seed)
+    samples = [Sample(rng.choice(["malware", "goodware"]), rng.choices(NAMES, k=rng.randint(0, 30))) for _ in range(count)]
+    write_samples(path, samples)
+    return samples
+
+@pytest.mark.parametrize("make", [BowVectorizer, lambda: HashingVectorizer(1 << 5)], ids=["bow", "hashing"])
+def test_miss_build_hit(tmp_path, make):
+    path = tmp_path / "corpus.json"
+    samples = write(path, 200)
+    cache = FeatureCache(tmp_path / "cache")
+
+    assert cache.get(path, make()) is None
+    vectorizer = make()
+    features = cache.features(path, vectorizer)
+    expected = vectorizer.fresh().transform(sample.apis for sample in samples)
+    assert np.array_equal(features.matrix.toarray(), expected.toarray())
+    assert [features.classes[i] for i in features.labels] == [sample.application_type for sample in samples]
+
+    # Un vettorizzatore nuovo (come in una nuova esecuzione) trova la voce; il vocabolario arriva dalla cache
+    vectorizer = make()
+    hit = cache.get(path, vectorizer)
+    assert hit is not None and hit.folder == features.folder
+    assert np.array_equal(hit.matrix.toarray(), expected.toarray())
+    if isinstance(vectorizer, BowVectorizer):
+        assert vectorizer.vocabulary.tokens == features.vocabulary().tokens
+
+def test_parameters_have_separate_entries(tmp_path):
+    path = tmp_path / "corpus.json"
+    write(path, 50)
+    cache = FeatureCache(tmp_path / "cache")
+    bow = cache.features(path, BowVectorizer())
+    assert cache.get(path, HashingVectorizer(1 << 5)) is None
+    assert cache.features(path, HashingVectorizer(1 << 5)).folder != bow.folder
+    assert cache.get(path, HashingVectorizer(1 << 6)) is None
+
+def test_changed_file_invalidates(tmp_path):
+    path = tmp_path / "corpus.json"
+    write(path, 200)
+    cache = FeatureCache(tmp_path / "cache")
+    first = cache.features(path, BowVectorizer())
+
+    stat = path.stat()
+    samples = write(path, 201, seed=1)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get(path, BowVectorizer()) is None
+    second = cache.features(path, BowVectorizer())
+    assert second.folder != first.folder
+    assert second.matrix.shape[0] == len(samples)
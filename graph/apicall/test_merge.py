@@ -0,0 +1,73 @@
+import random
+from pathlib import Path
+import pytest
+from apinames import ApiTable
+from columnar import pack, shards
+from corpus import Sample, iter_samples, sha256_or_none, write_samples
+from dedup import DedupIndex
+from markov import class_name
+from merge import Source, merge
+
+APIMDS = ["kernel32.dll!CreateFileW", "KERNEL32.GetSystemDirectoryA", "RegOpenKeyExW", "LoadLibrary", "Sleep"]
+OCTACK = ["createfile", "getsystemdirectorya", "regopenkeyex", "ntclose", "sleep"]
+
+def synthetic(rng: random.Random, names: list[str], labels: list[str], count: int, hashed: bool) -> list[Sample]:
+    return [Sample(rng.choice(labels), rng.choices(names, k=rng.randint(5, 40)),
+                   f"{rng.getrandbits(256):064x}" if hashed and i % 4 else None) for i in range(count)]
+
+@pytest.fixture
+def sources(tmp_path) -> tuple[list[Source], list[list[Sample]]]:
+    """Due JSON e un corpus colonnare con nomi di API in forme diverse; la terza sorgente ripete parte della prima."""
+    rng = random.Random(0)
+    first = synthetic(rng, APIMDS, ["Trojan", "Worms", "Backdoor"], 120, hashed=True)
+    second = synthetic(rng, OCTACK, ["trojan", "adware", "goodware"], 80, hashed=False)
+    third = first[:30] + synthetic(rng, APIMDS, ["Spyware", "Virus"], 20, hashed=True)
+    write_samples(tmp_path / "first.json", first)
+    pack(second, tmp_path / "second")
+    write_samples(tmp_path / "third.json", third)
+    return [Source("apimds", tmp_path / "first.json"), Source("octack", tmp_path / "second"),
+            Source("quovadis", tmp_path / "third.json")], [first, second, third]
+
+def expected(output: Path, samples: list[Sample]) -> list[Sample]:
+    """Gli esempi come li scrive merge: etichette su ClassName e API in forma canonica."""
+    table = ApiTable.load(output / "apis.json")
+    return [Sample(class_name(s.application_type).value, [table.canonical(api) for api in s.apis],
+                   sha256_or_none(s.sha256)) for s in samples]
+
+def test_merge_keeps_samples_labels_and_apis(tmp_path, sources):
+    sources, (first, second, third) = sources
+    summary = merge(sources, tmp_path / "merged", shard_calls=500)
+    merged = list(iter_samples(tmp_path / "merged"))
+    assert merged == expected(tmp_path / "merged", first + second + third)
+    assert summary["samples"] == len(merged) == len(first) + len(second) + len(third)
+    assert len(summary["shards"]) == len(shards(tmp_path / "merged")) > 1
+    assert "getsystemdirectory" in ApiTable.load(tmp_path / "merged" / "apis.json").names
+
+def test_merge_drops_duplicates(tmp_path, sources):
+    sources, (first, second, third) = sources
+    with DedupIndex(tmp_path / "index") as index:
+        summary = merge(sources, tmp_path / "merged", index=index, shard_calls=500)
+    assert [s["duplicates"] for s in summary["sources"]] == [0, 0, 30]
+    assert list(iter_samples(tmp_path / "merged")) == expected(tmp_path / "merged", first + second + third[30:])
+
+def test_merge_again_with_the_same_index(tmp_path, sources):
+    sources, (first, second, third) = sources
+    with DedupIndex(tmp_path / "index") as index:
+        merge(sources, tmp_path / "merged", index=index, shard_calls=500)
+    before = list(iter_samples(tmp_path / "merged"))
+    with DedupIndex(tmp_path / "index") as index:
+        summary = merge(sources, tmp_path / "merged", index=index, shard_calls=500)
+    assert [s["duplicates"] for s in summary["sources"]] == [0, 0, 30]
+    assert list(iter_samples(tmp_path / "merged")) == before
+
+def test_merge_replaces_old_shards(tmp_path, sources):
+    sources, (first, second, third) = sources
+    merge(sources, tmp_path / "merged", shard_calls=500)
+    summary = merge(sources[2:], tmp_path / "merged", shard_calls=500)
+    assert len(shards(tmp_path / "merged")) == len(summary["shards"])
+    assert list(iter_samples(tmp_path / "merged")) == expected(tmp_path / "merged", third)
+
+def test_merge_refuses_a_source_as_output(tmp_path, sources):
+    sources, _ = sources
+    with pytest.raises(ValueError):
+        merge(sources, sources[1].path)
@@ -0,0 +1,54 @@
+import random
+import numpy as np
+import pytest
+from apinames import ApiTable
+from bow import CsrMatrix, INDEX_DTYPE
+from ngrams import MULTIPLIER, NgramVectorizer, window_hashes
+
+MIN_DF = 3
+
+def reference_hash(window: list[int], n: int, gap: int) -> int:
+    """window_hashes di una sola finestra, con gli interi di Python (aritmetica modulo 2^64)."""
+    mask = (1 << 64) - 1
+    h = n * 1_000_003 + gap
+    for value in window:
+        h = (h * int(MULTIPLIER) + value + 1) & mask
+    h ^= h >> 33
+    h = (h * 0xFF51AFD7ED558CCD) & mask
+    return h ^ (h >> 33)
+
+@pytest.fixture
+def sequences() -> list[np.ndarray]:
+    """Sequenze di id con API sconosciute (-1) e sequenze vuote."""
+    rng = random.Random(0)
+    return [np.array(rng.choices(range(-1, 20), k=rng.randint(0, 60)), dtype=INDEX_DTYPE) for _ in range(300)]
+
+@pytest.fixture
+def vectorizer() -> NgramVectorizer:
+    return NgramVectorizer(ApiTable.build([f"Api{i}" for i in range(20)]), (1, 2, 3), skip=1, n_features=1 << 8)
+
+@pytest.mark.parametrize("n, gap", [(1, 1), (2, 1), (3, 1), (2, 3), (3, 2)])
+def test_window_hashes(sequences, n, gap):
+    span = (n - 1) * gap
+    for ids in sequences[:20]:
+        expected = [reference_hash(ids[i:i + span + 1:gap].tolist(), n, gap) for i in range(len(ids) - span)]
+        assert window_hashes(ids, n, gap).tolist() == expected
+
+def test_df(sequences, vectorizer):
+    dense = vectorizer.transform(sequences).toarray()
+    assert vectorizer.documents == len(sequences)
+    assert np.array_equal(vectorizer.df, np.count_nonzero(dense, axis=0))
+
+def test_pruned_columns_are_stable(tmp_path, sequences, vectorizer):
+    raw = vectorizer.transform(sequences)
+    dense = raw.toarray()
+    pruned = vectorizer.prune(raw, MIN_DF, block_rows=7)
+    assert np.array_equal(vectorizer.kept, np.flatnonzero(np.count_nonzero(dense, axis=0) >= MIN_DF))
+    assert np.array_equal(pruned.toarray(), dense[:, vectorizer.kept])
+    # Vettorizzando di nuovo con il vettorizzatore potato (anche da una copia fresh, come nei worker)
+    assert np.array_equal(vectorizer.transform(sequences).toarray(), pruned.toarray())
+    assert np.array_equal(vectorizer.fresh().transform(sequences).toarray(), pruned.toarray())
+
+    shape = vectorizer.prune(raw, MIN_DF, tmp_path / "pruned", block_rows=7)
+    assert tuple(shape) == tuple(pruned.shape)
+    assert np.array_equal(CsrMatrix.load(tmp_path / "pruned").toarray(), pruned.toarray())
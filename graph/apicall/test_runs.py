@@ -0,0 +1,44 @@
+import json
+import random
+import numpy as np
+import pytest
+from corpus import Sample, iter_samples
+from runs import MAX_PERIOD, Block, compress, expand, from_json, to_json, write_runs
+
+NAMES = ["a", "b"] + [f"Api{i}" for i in range(4)]
+
+def sequences() -> list[list[str]]:
+    """Sequenze vuote, costanti e con motivi ripetuti di varia lunghezza, anche oltre MAX_PERIOD."""
+    rng = random.Random(0)
+
+    def sequence() -> list[str]:
+        calls, length = [], rng.randint(0, 200)
+        while len(calls) < length:
+            motif = rng.choices(NAMES, k=rng.randint(1, MAX_PERIOD + 3))
+            calls.extend(motif * rng.randint(1, 6))
+        return calls
+
+    return [[], ["a"], ["a"] * 5, ["a", "b"] * 4 + ["a"]] + [sequence() for _ in range(300)]
+
+def test_run():
+    assert compress(["a"] * 5) == [Block(("a",), 5)]
+
+@pytest.mark.parametrize("max_period", [1, 3, MAX_PERIOD])
+def test_expand_compress(max_period):
+    for calls in sequences():
+        blocks = compress(calls, max_period)
+        assert expand(blocks) == calls
+        assert all(len(block.motif) <= max_period and block.repeat >= 1 for block in blocks)
+        assert from_json(json.loads(json.dumps(to_json(blocks)))) == blocks
+
+def test_expand_compress_ndarray():
+    for calls in sequences():
+        ids = np.array([NAMES.index(api) for api in calls], dtype=np.int32)
+        assert expand(compress(ids)) == ids.tolist()
+
+def test_write_runs_reads_back(tmp_path):
+    samples = [Sample("malware" if i % 2 else "goodware", calls, None if i % 3 else f"{i:064x}")
+               for i, calls in enumerate(sequences())]
+    calls, _ = write_runs(tmp_path / "runs.json", samples)
+    assert calls == sum(len(sample.apis) for sample in samples)
+    assert list(iter_samples(tmp_path / "runs.json")) == samples
@@ -0,0 +1,41 @@
+import random
+import numpy as np
+import pytest
+from bow import BowVectorizer, CsrMatrix, HashingVectorizer, Vocabulary
+from shard import fit_vocabulary, vectorize_file
+
+NAMES = [f"Api{i}" for i in range(50)]
+VOCABULARY = Vocabulary(NAMES[:40])  # le ultime 10 API sono fuori vocabolario
+
+def same_matrix(a: CsrMatrix, b: CsrMatrix) -> bool:
+    return (tuple(a.shape) == tuple(b.shape) and np.array_equal(a.indptr, b.indptr)
+            and np.array_equal(a.indices, b.indices) and np.array_equal(a.data, b.data))
+
+@pytest.fixture
+def calls(tmp_path) -> tuple:
+    """File con un esempio per riga, righe vuote comprese, e gli stessi esempi già divisi."""
+    rng = random.Random(0)
+    lines = [" ".join(rng.choices(NAMES, k=rng.randint(0, 40))) for _ in range(500)]
+    path = tmp_path / "calls.txt"
+    path.write_text("".join(f"{line}\n" for line in lines))
+    return path, [line.split() for line in lines]
+
+@pytest.mark.parametrize("make", [lambda: BowVectorizer(VOCABULARY), lambda: HashingVectorizer(1 << 6)], ids=["bow", "hashing"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_matches_serial(tmp_path, calls, make, workers):
+    path, samples = calls
+    serial = make()
+    expected = serial.transform(samples)
+
+    parallel = make()
+    assert same_matrix(vectorize_file(path, parallel, workers=workers, chunk_size=512), expected)
+    # Lo stato unito dai worker (oov, nomi delle colonne) è quello di un solo processo
+    assert vars(parallel) == vars(serial)
+
+    shape = vectorize_file(path, make(), tmp_path / "matrix", workers=workers, chunk_size=512)
+    assert tuple(shape) == tuple(expected.shape)
+    assert same_matrix(CsrMatrix.load(tmp_path / "matrix"), expected)
+
+def test_fit_vocabulary(calls):
+    path, _ = calls
+    assert fit_vocabulary(path, 2, 512).tokens == Vocabulary(NAMES).tokens
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from multiprocessing import get_context
+from pathlib import Path
+from typing import NamedTuple
+
+DEFAULT_SIZES = [(20, 2), (50, 4), (200, 8)]  # (classi, classificatori) dei dataset sintetici
+DEFAULT_DPI = [100, 300]
+
+class Case(NamedTuple):
+    chart: str
+    ext: str
+    dpi: int
+    classes: int | None = None      # None: dati reali di data.json
+    classifiers: int | None = None
+
+def synthetic_datasets(n_classes: int, n_classifiers: int, seed: int = 0):
+    """
+    Dataset sintetico con n_classes classi e n_classifiers classificatori.
+    Le chiavi sono Enum generati al volo (i modelli usano model_construct per non passare
+    dalla validazione su ClassName/ClassifierName); le metriche derivano da matrici casuali.
+    """
+    import numpy as np
+    from model import ClassCounts, ClassMetrics, Aggregates, ConfusionMatrix, Classifier, DatasetEntry
+    from metrics import derive
+
+    rng = np.random.default_rng(seed)
+    classes = list(Enum("SyntheticClass", {f"class_{i}": f"class_{i}" for i in range(n_classes)}, type=str))
+    classifiers = list(Enum("SyntheticClassifier", {f"clf_{i}": f"clf_{i}" for i in range(n_classifiers)}, type=str))
+    name = Enum("SyntheticDataset", {"synthetic": f"synthetic-{n_classes}x{n_classifiers}"}, type=str).synthetic
+
+    matrices = []
+    for _ in classifiers:
+        noise = rng.poisson(2, (n_classes, n_classes)) * (rng.random((n_classes, n_classes)) < 0.2)
+        matrices.append((noise + np.diag(rng.integers(20, 500, n_classes))).tolist())
+    derived = derive(matrices)
+
+    def metrics(values):
+        return ClassMetrics.model_construct(precision=float(values[0]), recall=float(values[1]), f1_score=float(values[2]))
+
+    entry = DatasetEntry.model_construct(
+        classes={c: ClassCounts.model_construct(test=int(rng.integers(100, 5000)), eval=int(rng.integers(25, 1250))) for c in classes},
+        classifiers={
+            clf: Classifier.model_construct(
+                classes={c: metrics((derived.precision[i, j], derived.recall[i, j], derived.f1_score[i, j])) for j, c in enumerate(classes)},
+                confusion_matrix=ConfusionMatrix.model_construct(classes=classes, matrix=matrices[i]),
+                aggregates=Aggregates.model_construct(micro=metrics(derived.micro[i]), macro=metrics(derived.macro[i])),
+                global_accuracy=float(derived.accuracy[i]),
+            )
+            for i, clf in enumerate(classifiers)
+        },
+    )
+    return {name: entry}
+
+def _peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _run_case(case: Case) -> dict:
+    import matplotlib
+    matplotlib.use("Agg")
+    from dataset import CHARTS, MediaOutput
+    from model import Datasets
+
+    if case.classes is None:
+        with open(Path(__file__).resolve().parent / "data.json") as f:
+            datasets = Datasets.model_validate(json.load(f)).root
+    else:
+        datasets = synthetic_datasets(case.classes, case.classifiers)
+
+    result = case._asdict()
+    result["peak_rss_before_kb"] = _peak_rss_kb()
+    with tempfile.TemporaryDirectory() as tmp:
+        output_folder = Path(tmp)
+        start = time.perf_counter()
+        try:
+            for name, entry in datasets.items():
+                CHARTS[case.chart].function(entry, name, output_folder, MediaOutput(case.ext), dpi=case.dpi, **CHARTS[case.chart].options)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["seconds"] = time.perf_counter() - start
+        files = list(output_folder.iterdir())
+        result["files"] = len(files)
+        result["bytes"] = sum(f.stat().st_size for f in files)
+    result["peak_rss_kb"] = _peak_rss_kb()
+    return result
+
+def build_cases(charts: list[str], exts: list[str], dpis: list[int], sizes: list[tuple[int, int]]) -> list[Case]:
+    sources = [(None, None)] + sizes
+    return [
+        Case(chart, ext, dpi, classes, classifiers)
+        for classes, classifiers in sources
+        for chart in charts
+        for ext in exts
+        for dpi in dpis
+    ]
+
+def run_cases(cases: list[Case]) -> list[dict]:
+    """
+    Ogni caso gira in un processo nuovo (uno alla volta, per non falsare i tempi):
+    così il picco di RSS misurato appartiene solo a quel caso.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn"), max_tasks_per_child=1) as pool:
+        results = []
+        for result in pool.map(_run_case, cases):
+            status = result.get("error", "ok")
+            print(f"{result['chart']:<20} {result['ext']} dpi={result['dpi']:<4} "
+                  f"classi={result['classes'] or 'data.json'} {result['seconds']:.2f}s {result['bytes']}B {status}")
+            results.append(result)
+    return results
+
+def _size(value: str) -> tuple[int, int]:
+    classes, classifiers = value.split("x")
+    return int(classes), int(classifiers)
+
+def main():
+    from dataset import CHARTS, MediaOutput
+
+    parser = argparse.ArgumentParser(description="Benchmark dei grafici del report (tempo, picco RSS, byte scritti)")
+    parser.add_argument("--charts", nargs="+", choices=list(CHARTS), default=list(CHARTS))
+    parser.add_argument("--ext", nargs="+", choices=[m.value for m in MediaOutput], default=[m.value for m in MediaOutput])
+    parser.add_argument("--dpi", nargs="+", type=int, default=DEFAULT_DPI)
+    parser.add_argument("--sizes", nargs="*", type=_size, default=DEFAULT_SIZES,
+                        help="dataset sintetici come CLASSIxCLASSIFICATORI, es. 50x4")
+    parser.add_argument("--report", type=Path, default=Path(__file__).resolve().parent / "bench-report.json")
+    args = parser.parse_args()
+
+    import matplotlib
+    results = run_cases(build_cases(args.charts, args.ext, args.dpi, args.sizes))
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "matplotlib": matplotlib.__version__,
+            "cpu_count": os.cpu_count(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Report salvato in: {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import hashlib
+import inspect
+import json
+from functools import cache
+from pathlib import Path
+from pydantic_core import to_json
+from render import RenderJob
+
+MANIFEST = ".render-manifest.json"
+# Da incrementare quando cambia qualcosa che influisce sui grafici e non è coperto dalla chiave
+CACHE_VERSION = 1
+# Moduli usati dalle funzioni di disegno: una modifica invalida tutti i grafici
+HELPERS = ("template", "confusion", "store", "metrics", "model")
+
+@cache
+def _environment() -> bytes:
+    """Hash di tutto ciò che i grafici condividono: versione, moduli di supporto, colori, impostazioni di matplotlib."""
+    import matplotlib
+    from dataset import CLASS_COLORS
+    digest = hashlib.sha256(f"{CACHE_VERSION}|{matplotlib.__version__}".encode())
+    for name in HELPERS:
+        digest.update((Path(__file__).resolve().parent / f"{name}.py").read_bytes())
+    digest.update(repr(CLASS_COLORS).encode())
+    digest.update(repr(sorted(matplotlib.rcParams.items())).encode())
+    return digest.digest()
+
+class RenderCache:
+    """
+    Cache indirizzata per contenuto dei grafici generati.
+    La chiave di ogni job è l'hash di: porzione del modello letta dal grafico,
+    sorgente e opzioni della funzione di disegno, formato di output e dpi, più l'ambiente comune a tutti i grafici
+    (CACHE_VERSION, sorgenti dei moduli HELPERS, colori delle classi, versione e rcParams di matplotlib).
+    Il manifest (nella cartella di output) associa ogni file prodotto alla chiave che l'ha generato.
+    """
+
+    def __init__(self, output_folder: Path):
+        self.path = output_folder / MANIFEST
+        self.entries: dict[str, str] = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    def key(self, job: RenderJob) -> str:
+        from dataset import CHARTS
+        chart = CHARTS[job.chart]
+        digest = hashlib.sha256(_environment())
+        digest.update(to_json(chart.data(job.dataset)))
+        digest.update(inspect.getsource(chart.function).encode())
+        digest.update(repr(sorted(chart.options.items())).encode())
+        digest.update(f"{job.ext}|{job.dpi}".encode())
+        return digest.hexdigest()
+
+    def outputs(self, job: RenderJob) -> list[str]:
+        from dataset import CHARTS, MediaOutput
+        return CHARTS[job.chart].outputs(job.dataset, job.dataset_name, MediaOutput(job.ext))
+
+    def fresh(self, job: RenderJob) -> bool:
+        """True se tutti i file del job esistono e sono stati generati con la stessa chiave."""
+        key = self.key(job)
+        return all(
+            self.entries.get(output) == key and (job.output_folder / output).exists()
+            for output in self.outputs(job)
+        )
+
+    def store(self, job: RenderJob):
+        key = self.key(job)
+        for output in self.outputs(job):
+            self.entries[output] = key
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f, indent=4, sort_keys=True)
+
+if __name__ == "__main__":
+    print("This file it's not intended to be run")
+    exit(1)
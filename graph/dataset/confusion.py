@@ -0,0 +1,134 @@
+from __future__ import annotations
+from enum import Enum
+from typing import TYPE_CHECKING
+
+# ConfusionView è usato da dataset.py a import time: numpy e matplotlib solo dentro le funzioni
+if TYPE_CHECKING:
+    import numpy as np
+    from matplotlib.patches import PathPatch
+
+class ConfusionView(str, Enum):
+    counts = "counts"          # conteggi grezzi
+    normalized = "normalized"  # righe normalizzate (recall per classe reale)
+    sparse = "sparse"          # celle a zero trasparenti e non annotate
+    top_k = "top_k"            # solo le k classi coinvolte nelle confusioni più frequenti
+
+TEXT_LIMIT = 12         # fino a questo numero di classi un Text per cella (resa classica)
+ANNOTATION_LIMIT = 60   # oltre questo numero di classi le celle non vengono annotate
+TICK_LIMIT = 40         # oltre questo numero di classi si mostra un'etichetta ogni tanto
+
+def top_confused(matrix: np.ndarray, k: int) -> np.ndarray:
+    """Indici (ordinati) delle k classi che compaiono nelle confusioni fuori diagonale più frequenti."""
+    import numpy as np
+
+    off_diagonal = matrix.astype(float)
+    np.fill_diagonal(off_diagonal, 0)
+    order = np.argsort(off_diagonal, axis=None)[::-1]
+    rows, cols = np.unravel_index(order, matrix.shape)
+    # Alterno reale/predetto per ogni coppia, tengo la prima occorrenza di ogni classe
+    pairs = np.stack([rows, cols], axis=1).ravel()
+    _, first = np.unique(pairs, return_index=True)
+    return np.sort(pairs[np.sort(first)][:k])
+
+def prepare(matrix: np.ndarray, classes: list[str], view: ConfusionView, k: int = 10):
+    """Restituisce valori (eventualmente mascherati) e classi da disegnare per la vista richiesta."""
+    import numpy as np
+
+    if view == ConfusionView.top_k and len(classes) > k:
+        index = top_confused(matrix, k)
+        matrix = matrix[np.ix_(index, index)]
+        classes = [classes[i] for i in index]
+    if view == ConfusionView.normalized:
+        totals = matrix.sum(axis=1, keepdims=True)
+        matrix = np.divide(matrix, totals, out=np.zeros(matrix.shape), where=totals != 0)
+    if view == ConfusionView.sparse:
+        matrix = np.ma.masked_equal(matrix, 0)
+    return matrix, classes
+
+def annotation_patch(values: np.ndarray, mask: np.ndarray, fmt: str, **kwargs) -> PathPatch:
+    """
+    Tutte le annotazioni delle celle come un unico artist: i glifi di ogni valore
+    vengono convertiti in tracciati (uno per testo distinto) e uniti in un solo Path composto.
+    """
+    import numpy as np
+    from matplotlib.patches import PathPatch
+    from matplotlib.path import Path
+    from matplotlib.textpath import TextPath
+
+    rows, cols = np.nonzero(mask)
+    labels = [fmt.format(values[r, c]) for r, c in zip(rows, cols)]
+    glyphs = {label: TextPath((0, 0), label) for label in set(labels)}
+    if not glyphs:
+        return PathPatch(Path(np.empty((0, 2))), **kwargs)
+
+    # Stessa scala per tutti i valori: il più largo deve stare nella cella (lato 1 in coordinate dati).
+    # Uso il box dei vertici (punti di controllo compresi), molto più economico di get_extents.
+    centers = {label: (p.vertices[:, 0].min() + p.vertices[:, 0].max()) / 2 for label, p in glyphs.items()}
+    width = max(np.ptp(p.vertices[:, 0]) for p in glyphs.values())
+    height = np.ptp(TextPath((0, 0), "0").vertices[:, 1])
+    scale = min(0.3 / height, 0.85 / width)
+
+    vertices, codes = [], []
+    for label, r, c in zip(labels, rows, cols):
+        glyph = glyphs[label]
+        # L'asse y di imshow è invertito: ribalto il glifo prima di centrarlo nella cella
+        offset = np.array([centers[label], height / 2])
+        vertices.append((glyph.vertices - offset) * (scale, -scale) + (c, r))
+        codes.append(glyph.codes)
+    return PathPatch(Path(np.concatenate(vertices), np.concatenate(codes)), **kwargs)
+
+def draw_confusion_matrix(ax, matrix: np.ndarray, classes: list[str], view: ConfusionView = ConfusionView.counts,
+                          k: int = 10, annotate_min: float | None = None):
+    """
+    Disegna una matrice di confusione su ax in modo scalabile con il numero di classi:
+    - fino a TEXT_LIMIT classi annota ogni cella con un Text (resa identica alla versione originale);
+    - fino a ANNOTATION_LIMIT classi le annotazioni sono un unico artist;
+    - oltre, nessuna annotazione.
+    Le celle con valore inferiore ad annotate_min non vengono annotate.
+    Heatmap e annotazioni sono rasterizzate anche nei formati vettoriali.
+    """
+    import numpy as np
+    import matplotlib
+
+    values, classes = prepare(np.asarray(matrix), classes, view, k)
+    n = len(classes)
+
+    cmap = matplotlib.colormaps["Blues"].copy()
+    cmap.set_bad(alpha=0)
+    im = ax.imshow(values, cmap=cmap, interpolation=None if n <= TEXT_LIMIT else "none", rasterized=True)
+
+    step = 1 if n <= TICK_LIMIT else int(np.ceil(n / TICK_LIMIT))
+    ticks = np.arange(0, n, step)
+    ax.set_xticks(ticks)
+    ax.set_yticks(ticks)
+    ax.set_xticklabels([classes[i] for i in ticks], rotation=45, ha="right")
+    ax.set_yticklabels([classes[i] for i in ticks])
+    ax.set_xlabel("Predetto")
+    ax.set_ylabel("Reale")
+
+    if n > ANNOTATION_LIMIT:
+        return im
+
+    filled = np.ma.filled(values, 0)
+    mask = ~np.ma.getmaskarray(values)
+    if annotate_min is not None:
+        mask &= filled >= annotate_min
+    fmt = "{:.2f}" if view == ConfusionView.normalized else "{:d}"
+    if not np.issubdtype(filled.dtype, np.integer) and view != ConfusionView.normalized:
+        filled = filled.astype(int)
+
+    if n <= TEXT_LIMIT:
+        # Valori numerici al centro di ogni cella
+        for x, y in zip(*np.nonzero(mask)):
+            ax.text(y, x, fmt.format(filled[x, y]), ha="center", va="center", color="black", fontsize=8)
+    else:
+        # add_artist invece di add_patch: i limiti degli assi sono già quelli dell'immagine
+        # Rasterizzata nei formati vettoriali: la dimensione del file non cresce con le celle
+        patch = annotation_patch(filled, mask, fmt, facecolor="black", linewidth=0, rasterized=True)
+        ax.add_artist(patch)
+        patch.set_clip_path(ax.patch)
+    return im
+
+if __name__ == "__main__":
+    print("This file it's not intended to be run")
+    exit(1)
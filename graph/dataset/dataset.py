@@ -1,9 +1,15 @@
+from __future__ import annotations
+import argparse
 import json
+import sys
 from pathlib import Path
-from model import Datasets, DatasetName, DatasetEntry, ClassifierName
-import matplotlib.pyplot as plt
 from enum import Enum
-import numpy as np
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple
+from confusion import ConfusionView
+
+# matplotlib, numpy e pydantic vengono importati solo dai grafici (e dai comandi) che li usano
+if TYPE_CHECKING:
+    from model import Datasets, DatasetName, DatasetEntry
 
 class MediaOutput(str, Enum):
     png = "png"
@@ -24,10 +30,14 @@ CLASS_COLORS = {
     "worm": "#cab2d6",        # Viola Lavanda
 }
 
-def print_graph_on_size(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput):
+def print_graph_on_size(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput, dpi: float | str = 300):
+    import matplotlib.pyplot as plt
+    from store import columns
+
     classes = list(dataset.classes.keys())
-    test = [dataset.classes[c].test for c in classes]
-    eval = [dataset.classes[c].eval for c in classes]
+    counts = columns(dataset, dataset_name).class_counts(dataset_name, classes)
+    test = counts[:, 0].tolist()
+    eval = counts[:, 1].tolist()
     total = [test[i] + eval[i] for i in range(len(classes))]
     x = range(len(classes))
     width = 0.25
@@ -56,54 +66,55 @@ def print_graph_on_size(dataset: DatasetEntry, dataset_name: DatasetName, output
     add_labels(bars_eval)
 
     output_path =  output_folder / (dataset_name._value_ + f'-class-distribution.{ext._value_}')
-    plt.savefig(output_path, dpi=300)  # Salva ad alta risoluzione
+    plt.savefig(output_path, dpi=dpi)  # Salva ad alta risoluzione
     plt.close() 
 
 def plot_class_metrics(dataset_name: DatasetName, data: Datasets):
+    from matplotlib.figure import Figure
+    import numpy as np
+    from template import BarPanel, ChartTemplate, get_template
+    from store import columns
+
     dataset = data.root[dataset_name]
+    store = columns(dataset, dataset_name)
+    width = 0.25
+
+    def build(classes):
+        fig = Figure(figsize=(12,6))
+        ax = fig.subplots()
+        x = np.arange(len(classes))
+        panel = BarPanel(ax, x, width, [
+            (0, "#1f77b4", "Precision"),
+            (width, "#ff7f0e", "Recall"),
+            (width*2, "#2ca02c", "F1 Score"),
+        ], label_offset=0.02, fontsize=9)
+
+        ax.set_xticks(x + width, [c.value for c in classes], rotation=45)
+        ax.set_ylim(0, 1.05)
+        ax.set_ylabel("Score")
+        ax.set_title("")
+        ax.legend()
+        fig.tight_layout()
+        return ChartTemplate(fig, [panel])
 
     # Itera sui classificatori
     for clf_name, clf_data in dataset.classifiers.items():
         classes = list(clf_data.classes.keys())
         classes.sort()
         
-        precision = [clf_data.classes[c].precision for c in classes]
-        recall = [clf_data.classes[c].recall for c in classes]
-        f1 = [clf_data.classes[c].f1_score for c in classes]
-
-        x = range(len(classes))
-        width = 0.25
-
-        plt.figure(figsize=(12,6))
-        bars_precision = plt.bar(x, precision, width=width, label="Precision", color="#1f77b4")
-        bars_recall = plt.bar([i + width for i in x], recall, width=width, label="Recall", color="#ff7f0e")
-        bars_f1 = plt.bar([i + width*2 for i in x], f1, width=width, label="F1 Score", color="#2ca02c")
-
-        plt.xticks([i + width for i in x], [c.value for c in classes], rotation=45)
-        plt.ylim(0, 1.05)
-        plt.ylabel("Score")
-        plt.title("")
-        plt.legend()
-        plt.tight_layout()
-
-        # Aggiungi valori sopra le barre
-        def add_labels(bars):
-            for bar in bars:
-                height = bar.get_height()
-                plt.text(bar.get_x() + bar.get_width()/2, height + 0.02, f"{height:.2f}",
-                         ha='center', va='bottom', fontsize=9)
+        precision, recall, f1 = store.class_metrics(dataset_name, clf_name, classes).T.tolist()
 
-        add_labels(bars_precision)
-        add_labels(bars_recall)
-        add_labels(bars_f1)
+        template = get_template(("plot_class_metrics", tuple(classes)), lambda: build(classes))
+        template.panels[0].update(precision, recall, f1)
 
         # Salva su disco
         output_file = Path(__file__).resolve().parent / f"{dataset_name.value}_{clf_name.value}_class_metrics.png"
-        plt.savefig(output_file, dpi=300)
-        plt.close()
+        template.save(output_file, dpi=300)
         print(f"Grafico salvato in: {output_file}")
 
 def plot_aggregates(dataset_name: DatasetName, data: Datasets):
+    import matplotlib.pyplot as plt
+
     dataset = data.root[dataset_name]
 
     # Itera sui classificatori
@@ -136,14 +147,16 @@ def plot_aggregates(dataset_name: DatasetName, data: Datasets):
             plt.close()
             print(f"Grafico salvato in: {output_file}")
 
-def print_cake(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput):
+def print_cake(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput, dpi: float | str = "figure"):
+    import matplotlib.pyplot as plt
+
     classes = list(dataset.classes.keys())
 
     train_vals = [dataset.classes[clx].test for clx in classes]
     eval_vals = [dataset.classes[clx].test for clx in classes]
     sizes = [train_vals[i] + eval_vals[i] for i in range(0, len(classes))]
     fig, ax = plt.subplots(figsize=(5, 5))
-    colors = [CLASS_COLORS[clx] for clx in classes]
+    colors = [CLASS_COLORS.get(clx) for clx in classes]  # None: colore predefinito per classi sconosciute
     ax.pie(
      sizes,
      labels=list(map(lambda x : x.name, classes)),
@@ -154,53 +167,22 @@ def print_cake(dataset: DatasetEntry, dataset_name: DatasetName, output_folder:
     ax.set_title("")
     output = output_folder / f"{dataset_name.value}-class_distribution.{ext.value}"
     # Salva il grafico su file (es. SVG con sfondo trasparente)
-    plt.savefig(output, format=ext.value, transparent=True, bbox_inches="tight")
+    plt.savefig(output, format=ext.value, transparent=True, dpi=dpi, bbox_inches="tight")
     # Chiudi la figura per evitare sovrapposizioni in loop multipli
     plt.close(fig)
     pass
 
-def print_graph_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput):
-    classes = list(dataset.classes.keys())
-    class_labels = [c.value for c in classes]
-    x = np.arange(len(classes))  # per gestire bene i bar offset
-
-    fig, axes = plt.subplots(1, 2, figsize=(10, 5), sharey=True)
-    width = 0.25
-
-    for index, classifier in enumerate(ClassifierName):
-        precision, recall, f1 = [], [], []
-        for clx in classes:
-            data = dataset.classifiers[classifier].classes[clx]
-            precision.append(data.precision)
-            recall.append(data.recall)
-            f1.append(data.f1_score)
-
-        ax = axes[index]
-        ax.bar(x - width, precision, width, label="Precision")
-        ax.bar(x, recall, width, label="Recall")
-        ax.bar(x + width, f1, width, label="F1-Score")
-
-        ax.set_title(f"{dataset_name.value} - {classifier.name}")
-        ax.set_xticks(x)
-        ax.set_xticklabels(class_labels, rotation=45)
-        ax.set_ylim(0, 1)
-
-        if index == 0:
-            ax.set_ylabel("Score")
-
-    fig.suptitle("Confronto per classe: Precision, Recall e F1-score", fontsize=14)
-    fig.legend(["Precision", "Recall", "F1-Score"], loc="lower center", ncol=3, bbox_to_anchor=(0.5, -0.03))
-    fig.tight_layout(rect=[0, 0.05, 1, 0.95])
-
-    output = output_folder / f"{dataset_name.value}-metrics-class.{ext.value}"
-    plt.savefig(output, format=ext.value, transparent=True, bbox_inches="tight")
-    plt.close(fig)
-
-def print_graph_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput):
+def print_graph_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput, dpi: float | str = "figure",
+                        view: ConfusionView = ConfusionView.counts, annotate_min: float | None = None):
     """
     Stampa affiancate le matrici di confusione per ciascun classificatore.
-    Usa solo Matplotlib.
+    Usa solo Matplotlib. Con molte classi vedi confusion.draw_confusion_matrix.
+    Le celle con valore inferiore ad annotate_min restano senza annotazione.
     """
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from confusion import draw_confusion_matrix
+
     classifiers = list(dataset.classifiers.keys())
     n = len(classifiers)
     fig, axes = plt.subplots(1, n, figsize=(5 * n, 5))
@@ -216,77 +198,73 @@ def print_graph_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output
         matrix = np.array(clf_data.confusion_matrix.matrix)
         classes = [c.value for c in clf_data.confusion_matrix.classes]
 
-        im = ax.imshow(matrix, cmap="Blues")
+        draw_confusion_matrix(ax, matrix, classes, view, annotate_min=annotate_min)
         ax.set_title(f"{classifier.name}")
-        ax.set_xticks(np.arange(len(classes)))
-        ax.set_yticks(np.arange(len(classes)))
-        ax.set_xticklabels(classes, rotation=45, ha="right")
-        ax.set_yticklabels(classes)
-        ax.set_xlabel("Predetto")
-        ax.set_ylabel("Reale")
-
-        # Valori numerici al centro di ogni cella
-        for x in range(len(classes)):
-            for y in range(len(classes)):
-                ax.text(y, x, matrix[x, y], ha="center", va="center", color="black", fontsize=8)
 
     fig.tight_layout()
 
     # Percorso di output
-    output = output_folder / f"{dataset_name.value}-confusion-matrix.{ext.value}"
-    plt.savefig(output, format=ext.value, bbox_inches="tight", transparent=True)
+    suffix = "" if view == ConfusionView.counts else f"-{view.value}"
+    output = output_folder / f"{dataset_name.value}-confusion-matrix{suffix}.{ext.value}"
+    plt.savefig(output, format=ext.value, bbox_inches="tight", transparent=True, dpi=dpi)
     plt.close(fig)
 
-def print_class_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput):
+def print_class_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput, dpi: float | str = "figure"):
     """
     Genera un grafico per ciascuna metrica (F1-score, Precision, Recall)
     per ogni classificatore del dataset, con legenda sotto.
+    La figura viene costruita una volta per disposizione di classi e poi riutilizzata.
     """
+    from matplotlib.figure import Figure
+    import numpy as np
+    from template import BarPanel, ChartTemplate, get_template
+    from store import METRICS, columns
 
+    store = columns(dataset, dataset_name)
     metrics = {
         "f1_score": "F1-score",
         "precision": "Precision",
         "recall": "Recall"
     }
 
+    def build(classes_keys):
+        fig = Figure(figsize=(8, 6))
+        ax = fig.subplots()
+        x = np.arange(len(classes_keys))
+        panel = BarPanel(ax, x, 0.8, [(0, "steelblue", None)], label_offset=0.01, fontsize=8)
+
+        ax.set_title(" ")
+        ax.set_xlabel("Classi")
+        ax.set_ylabel(" ")
+        ax.set_xticks(x)
+        ax.set_xticklabels([clx.value for clx in classes_keys], rotation=45, ha="right")
+        ax.set_ylim(0, 1.1)
+
+        fig.tight_layout(rect=[0, 0.08, 1, 0.95])  # spazio per la legenda
+        return ChartTemplate(fig, [panel])
+
     for metric_key, metric_name in metrics.items():
         for classifier, classifier_data in dataset.classifiers.items():
-            data = classifier_data.classes
-            classes_keys = list(data.keys())
-            values = [getattr(data[clx], metric_key) for clx in classes_keys]
+            classes_keys = list(classifier_data.classes.keys())
+            values = store.class_metrics(dataset_name, classifier, classes_keys)[:, METRICS.index(metric_key)].tolist()
 
-            fig, ax = plt.subplots(figsize=(8, 6))
-            x = np.arange(len(classes_keys))
-            bars = ax.bar(x, values, color="steelblue", label=metric_name)
-
-            # valori sopra le barre
-            for bar in bars:
-                y = bar.get_height()
-                ax.text(
-                    bar.get_x() + bar.get_width() / 2,
-                    y + 0.01,
-                    f"{y:.2f}",
-                    ha="center",
-                    va="bottom",
-                    fontsize=8
-                )
-
-            ax.set_title(f"{classifier.name}")
-            ax.set_xlabel("Classi")
-            ax.set_ylabel(metric_name)
-            ax.set_xticks(x)
-            ax.set_xticklabels([clx.value for clx in classes_keys], rotation=45, ha="right")
-            ax.set_ylim(0, 1.1)   
-           
-            fig.tight_layout(rect=[0, 0.08, 1, 0.95])  # spazio per la legenda
+            template = get_template(("print_class_metrics", tuple(classes_keys)), lambda: build(classes_keys))
+            panel = template.panels[0]
+            panel.update(values)
+            panel.containers[0].set_label(metric_name)
+            panel.ax.set_title(f"{classifier.name}")
+            panel.ax.set_ylabel(metric_name)
 
             # nome file di output
             output = output_folder / f"{dataset_name.value}-{classifier.name}-{metric_key}.{ext.value}"
-            plt.savefig(output, format=ext.value, bbox_inches="tight", transparent=True)
-            plt.close(fig)
+            template.save(output, format=ext.value, bbox_inches="tight", transparent=True, dpi=dpi)
+
 
+def print_global_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput, dpi: float | str = "figure"):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from store import columns
 
-def print_global_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput):
     classifiers = list(dataset.classifiers.keys())
     n = len(classifiers)
 
@@ -299,17 +277,8 @@ def print_global_metrics(dataset: DatasetEntry, dataset_name: DatasetName, outpu
         "Macro Precision", "Macro Recall", "Macro F1-score"
     ]
 
-    # Raccolgo i valori per ogni classificatore
-    all_values = []
-    for classifier in classifiers:
-        metrics = dataset.classifiers[classifier]
-        all_values.append([
-            metrics.global_accuracy,
-            metrics.aggregates.micro.precision, metrics.aggregates.micro.recall, metrics.aggregates.micro.f1_score,
-            metrics.aggregates.macro.precision, metrics.aggregates.macro.recall, metrics.aggregates.macro.f1_score
-        ])
-
-    all_values = np.array(all_values)
+    # Raccolgo i valori per ogni classificatore: accuratezza, micro e macro (precision, recall, f1)
+    all_values = columns(dataset, dataset_name).global_metrics(dataset_name, classifiers)
     x = np.arange(len(metrics_names))
     width = 0.35
 
@@ -345,78 +314,198 @@ def print_global_metrics(dataset: DatasetEntry, dataset_name: DatasetName, outpu
 
     # Percorso di output
     output = output_folder / f"{dataset_name.value}-global-metrics.{ext.value}"
-    plt.savefig(output, format=ext.value, bbox_inches="tight", transparent=True)
+    plt.savefig(output, format=ext.value, bbox_inches="tight", transparent=True, dpi=dpi)
     plt.close(fig)
 
-def print_graph_class_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput):
+def print_graph_class_metrics(dataset: DatasetEntry, dataset_name: DatasetName, output_folder: Path, ext: MediaOutput, dpi: float | str = 300):
     """
     Crea un grafico con 3 sottografici (Precision, Recall, F1-score) per ogni classificatore
     del dataset. Ogni sottografico mostra le metriche per classe.
+    La figura viene costruita una volta per disposizione di classi e poi riutilizzata.
     """
-    for clf_name, clf_data in dataset.classifiers.items():
-        classes = list(clf_data.classes.keys())
-        classes.sort()
-
-        precision = [clf_data.classes[c].precision for c in classes]
-        recall = [clf_data.classes[c].recall for c in classes]
-        f1 = [clf_data.classes[c].f1_score for c in classes]
-        labels = [c.value for c in classes]
+    from matplotlib.figure import Figure
+    import numpy as np
+    from template import BarPanel, ChartTemplate, get_template
+    from store import columns
+
+    store = columns(dataset, dataset_name)
+    metrics = [
+        ("Precision", "#1f77b4"),
+        ("Recall", "#ff7f0e"),
+        ("F1-score", "#2ca02c"),
+    ]
 
+    def build(classes):
         # Crea figura con 3 sottografici orizzontali
-        fig, axes = plt.subplots(1, 3, figsize=(15, 6), sharey=True)
-        fig.suptitle(f"{dataset_name.value} - {clf_name.value}", fontsize=18, fontweight="bold")
-
-        metrics = [
-            ("Precision", precision, "#1f77b4"),
-            ("Recall", recall, "#ff7f0e"),
-            ("F1-score", f1, "#2ca02c"),
-        ]
-
-        def add_labels(ax, bars):
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(
-                    bar.get_x() + bar.get_width() / 2,
-                    height + 0.02,
-                    f"{height:.2f}",
-                    ha="center",
-                    va="bottom",
-                    fontsize=12,  # 🔹 numeri più grandi
-                    fontweight="medium",
-                )
-
-        for ax, (title, values, color) in zip(axes, metrics):
-            bars = ax.bar(labels, values, color=color)
+        fig = Figure(figsize=(15, 6))
+        axes = fig.subplots(1, 3, sharey=True)
+        fig.suptitle(" ", fontsize=18, fontweight="bold")
+        x = np.arange(len(classes))
+
+        panels = []
+        for ax, (title, color) in zip(axes, metrics):
+            panels.append(BarPanel(
+                ax, x, 0.8, [(0, color, None)], label_offset=0.02,
+                fontsize=12,  # 🔹 numeri più grandi
+                fontweight="medium",
+            ))
+            ax.set_xticks(x, [c.value for c in classes])
             ax.set_title(title, fontsize=14, fontweight="semibold")
             ax.set_ylim(0, 1.05)
             ax.tick_params(axis="x", rotation=45, labelsize=11)  # 🔹 classi più leggibili
             ax.tick_params(axis="y", labelsize=11)
             ax.set_ylabel("Score", fontsize=12)
-            add_labels(ax, bars)
 
-        plt.tight_layout(rect=[0, 0, 1, 0.95])
+        fig.tight_layout(rect=[0, 0, 1, 0.95])
+        return ChartTemplate(fig, panels)
+
+    for clf_name, clf_data in dataset.classifiers.items():
+        classes = list(clf_data.classes.keys())
+        classes.sort()
+
+        precision, recall, f1 = store.class_metrics(dataset_name, clf_name, classes).T.tolist()
+
+        template = get_template(("print_graph_class_metrics", tuple(classes)), lambda: build(classes))
+        template.fig.suptitle(f"{dataset_name.value} - {clf_name.value}", fontsize=18, fontweight="bold")
+        for panel, values in zip(template.panels, [precision, recall, f1]):
+            panel.update(values)
 
         output_file = output_folder / f"{dataset_name.value}_{clf_name.value}_metrics.{ext.value}"
-        plt.savefig(output_file, dpi=300, transparent=True)
-        plt.close()
-
-def main():
-    with open(Path(__file__).resolve().parent / 'data.json') as f:
-        raw = json.load(f)
-
-    output_dir = Path(__file__).parent / "output"
-    datasets = Datasets.model_validate(raw).root
-    for dataset in DatasetName:
-        print("dataset ", dataset, "in")
-        #print_graph_on_size(datasets[dataset.name], dataset, output_dir, MediaOutput.svg)
-        #print_cake(datasets[dataset.name], dataset, output_dir, MediaOutput.svg)
-        #print_graph_metrics(datasets[dataset.name], dataset, output_dir, MediaOutput.svg)
-        #print_class_metrics(datasets[dataset.name], dataset, output_dir, MediaOutput.svg)
-        #print_global_metrics(datasets[dataset.name], dataset, output_dir, MediaOutput.svg)
-        print_graph_class_metrics(datasets[dataset.name], dataset, output_dir, MediaOutput.svg)
-        print("dataset ", dataset, "ok")
-    return
+        template.save(output_file, dpi=dpi, transparent=True)
+
+class Chart(NamedTuple):
+    function: Callable[..., None]
+    per_classifier: bool  # True se il grafico produce un file per ciascun classificatore
+    data: Callable[[DatasetEntry], Any]  # porzione del modello effettivamente letta dal grafico
+    outputs: Callable[[DatasetEntry, DatasetName, MediaOutput], list[str]]  # file prodotti
+    options: dict[str, Any] = {}  # argomenti aggiuntivi della funzione (es. la vista della matrice di confusione)
+
+CLASS_METRICS = ["f1_score", "precision", "recall"]
+
+def confusion_chart(view: ConfusionView, annotate_min: float | None = None) -> Chart:
+    """Voce del registro per una vista della matrice di confusione (file <dataset>-confusion-matrix[-<vista>])."""
+    suffix = "" if view == ConfusionView.counts else f"-{view.value}"
+    return Chart(
+        print_graph_metrics, False,
+        lambda d: {clf: data.confusion_matrix for clf, data in d.classifiers.items()},
+        lambda d, name, ext: [f"{name.value}-confusion-matrix{suffix}.{ext.value}"],
+        {"view": view, "annotate_min": annotate_min},
+    )
+
+# Registro dei grafici disponibili: ogni voce diventa un job indipendente per lo scheduler
+CHARTS: dict[str, Chart] = {
+    "graph_on_size": Chart(
+        print_graph_on_size, False,
+        lambda d: d.classes,
+        lambda d, name, ext: [f"{name.value}-class-distribution.{ext.value}"],
+    ),
+    "cake": Chart(
+        print_cake, False,
+        lambda d: d.classes,
+        lambda d, name, ext: [f"{name.value}-class_distribution.{ext.value}"],
+    ),
+    "confusion_matrix": confusion_chart(ConfusionView.counts),
+    # Righe normalizzate: le frazioni sotto l'1% non vengono annotate
+    "confusion_normalized": confusion_chart(ConfusionView.normalized, annotate_min=0.01),
+    "confusion_sparse": confusion_chart(ConfusionView.sparse),
+    "confusion_top_k": confusion_chart(ConfusionView.top_k),
+    "class_metrics": Chart(
+        print_class_metrics, True,
+        lambda d: {clf: data.classes for clf, data in d.classifiers.items()},
+        lambda d, name, ext: [f"{name.value}-{clf.name}-{m}.{ext.value}" for m in CLASS_METRICS for clf in d.classifiers],
+    ),
+    "global_metrics": Chart(
+        print_global_metrics, False,
+        lambda d: {clf: (data.global_accuracy, data.aggregates) for clf, data in d.classifiers.items()},
+        lambda d, name, ext: [f"{name.value}-global-metrics.{ext.value}"],
+    ),
+    "graph_class_metrics": Chart(
+        print_graph_class_metrics, True,
+        lambda d: {clf: data.classes for clf, data in d.classifiers.items()},
+        lambda d, name, ext: [f"{name.value}_{clf.value}_metrics.{ext.value}" for clf in d.classifiers],
+    ),
+}
 
+DATA_FILE = Path(__file__).resolve().parent / "data.json"
+OUTPUT_DIR = Path(__file__).resolve().parent / "output"
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Genera i grafici del report a partire da data.json")
+    parser.add_argument("--list", action="store_true", help="elenca i grafici disponibili ed esce")
+    parser.add_argument("--validate", action="store_true", help="valida data.json (schema e coerenza delle metriche) ed esce")
+    parser.add_argument("--charts", nargs="+", choices=list(CHARTS), default=list(CHARTS), metavar="CHART",
+                        help="grafici da generare (default: tutti, vedi --list)")
+    parser.add_argument("--datasets", nargs="+", metavar="DATASET", help="dataset da includere (default: tutti)")
+    parser.add_argument("--classifiers", nargs="+", metavar="CLASSIFIER", help="classificatori da includere (default: tutti)")
+    parser.add_argument("--format", choices=[m.value for m in MediaOutput], default=MediaOutput.svg.value)
+    parser.add_argument("--dpi", type=float, help="dpi di salvataggio (default: quello previsto da ciascun grafico)")
+    parser.add_argument("--workers", type=int, help="processi di rendering (default: uno per core)")
+    parser.add_argument("--data", type=Path, default=DATA_FILE)
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--force", action="store_true", help="ignora la cache e rigenera tutti i grafici selezionati")
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+
+    if args.list:
+        for name, chart in CHARTS.items():
+            print(f"{name:<20} {'per classificatore' if chart.per_classifier else 'per dataset'}")
+        return 0
+
+    from model import Datasets, DatasetName, ClassifierName
+    from loader import iter_datasets
+    from metrics import verify
+
+    try:
+        selected = [DatasetName(d) for d in args.datasets] if args.datasets else list(DatasetName)
+        classifiers = [ClassifierName(c) for c in args.classifiers] if args.classifiers else list(ClassifierName)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    problems = []
+
+    def datasets():
+        # data.json viene letto e validato un dataset alla volta, saltando quelli non selezionati
+        for name, entry in iter_datasets(args.data, selected):
+            for problem in verify(Datasets.model_construct({name: entry})):
+                print("metrica non coerente con la matrice di confusione:", problem)
+                problems.append(problem)
+            entry = entry.model_copy(update={
+                "classifiers": {clf: v for clf, v in entry.classifiers.items() if clf in classifiers}
+            })
+            if not entry.classifiers:
+                print(f"{name.value}: nessun risultato per i classificatori selezionati, solo grafici delle classi", file=sys.stderr)
+            yield name, entry
+
+    try:
+        if args.validate:
+            for _ in datasets():
+                pass
+            return 1 if problems else 0
+
+        # Backend non interattivo impostato prima che qualunque grafico carichi pyplot
+        import matplotlib
+        matplotlib.use("Agg")
+        from render import build_jobs, run_jobs
+        from cache import RenderCache
+
+        args.output.mkdir(parents=True, exist_ok=True)
+        # Salta i grafici il cui contenuto non è cambiato dall'ultima generazione
+        cache = RenderCache(args.output)
+        jobs = build_jobs(datasets(), args.charts, args.output, args.format, args.dpi)
+        jobs = (job for job in jobs if args.force or not cache.fresh(job))
+        try:
+            for job in run_jobs(jobs, args.workers):
+                cache.store(job)
+                print("dataset ", job.dataset_name.value, job.chart, "ok")
+        finally:
+            cache.save()
+    except ValueError as e:  # anche ValidationError di pydantic
+        print(e, file=sys.stderr)
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
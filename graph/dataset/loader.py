@@ -0,0 +1,122 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+# Il lettore in streaming è usato anche da graph/apicall/corpus.py: pydantic solo dentro iter_datasets
+if TYPE_CHECKING:
+    from model import DatasetName, DatasetEntry
+
+CHUNK_SIZE = 1 << 16
+
+class _Reader:
+    """Buffer di lettura su file: contiene al più il valore JSON in corso di decodifica."""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size: int | None = None) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Scarto la parte già consumata: la memoria resta limitata al valore corrente
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Primo carattere non di spaziatura ("" a fine file), senza consumarlo."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"atteso {char!r} in posizione {self.pos}, trovato {self.peek()!r}")
+        self.pos += 1
+
+    def value(self, decoder: json.JSONDecoder):
+        """Decodifica il prossimo valore JSON, leggendo altri blocchi finché non è completo."""
+        self.peek()
+        # Raddoppio i blocchi a ogni tentativo fallito: i valori grandi non vengono ridecodificati troppe volte
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill(size):
+                    raise
+                size *= 2
+                continue
+            # Un numero può essere troncato a fine blocco: in quel caso ne serve un altro
+            if end == len(self.buffer) and self.fill(size):
+                continue
+            self.pos = end
+            return value
+
+def iter_raw(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[str, object]]:
+    """
+    Scorre le coppie (chiave, valore) dell'oggetto JSON di primo livello senza caricare tutto il file.
+    Ogni valore viene decodificato solo quando è interamente nel buffer.
+    """
+    decoder = json.JSONDecoder()
+    with open(path) as f:
+        reader = _Reader(f, chunk_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value(decoder)
+            reader.expect(":")
+            yield key, reader.value(decoder)
+            if reader.peek() == "}":
+                return
+            reader.expect(",")
+
+def iter_items(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[object]:
+    """
+    Scorre gli elementi dell'array JSON di primo livello senza caricare tutto il file:
+    in memoria resta solo l'elemento in corso di decodifica.
+    """
+    decoder = json.JSONDecoder()
+    with open(path) as f:
+        reader = _Reader(f, chunk_size)
+        reader.expect("[")
+        if reader.peek() == "]":
+            return
+        while True:
+            yield reader.value(decoder)
+            if reader.peek() == "]":
+                return
+            reader.expect(",")
+
+def iter_datasets(path: Path, names: Iterable[DatasetName] | None = None) -> Iterator[tuple[DatasetName, DatasetEntry]]:
+    """
+    Carica data.json un dataset alla volta: ogni DatasetEntry viene validato (e completato
+    con le metriche derivate) appena letto, e gli viene associato lo store colonnare.
+    Le voci non richieste in names vengono saltate senza validarle.
+    """
+    from model import Datasets, DatasetName
+    from store import MetricsStore
+
+    wanted = None if names is None else {DatasetName(n) for n in names}
+    for key, raw in iter_raw(path):
+        name = DatasetName(key)
+        if wanted is not None and name not in wanted:
+            continue
+        entry = Datasets.model_validate({name: raw}).root[name]
+        MetricsStore.from_datasets({name: entry})
+        yield name, entry
+
+if __name__ == "__main__":
+    print("This file it's not intended to be run")
+    exit(1)
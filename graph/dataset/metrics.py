@@ -0,0 +1,110 @@
+from typing import NamedTuple
+import numpy as np
+from model import Datasets, Classifier, ClassMetrics, Aggregates
+
+class DerivedMetrics(NamedTuple):
+    """
+    Metriche calcolate da un batch di matrici di confusione (righe: reale, colonne: predetto).
+    Gli array per classe hanno forma (matrici, classi) e sono a zero oltre il numero di classi della matrice.
+    """
+    precision: np.ndarray
+    recall: np.ndarray
+    f1_score: np.ndarray
+    micro: np.ndarray  # (matrici, 3): precision, recall, f1_score
+    macro: np.ndarray  # (matrici, 3): precision, recall, f1_score
+    accuracy: np.ndarray
+
+def _divide(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Divisione per zero -> 0, come zero_division=0 di scikit-learn
+    return np.divide(a, b, out=np.zeros_like(a, dtype=float), where=b != 0)
+
+def derive(matrices: list[list[list[int]]]) -> DerivedMetrics:
+    """
+    Calcola in un solo passaggio vettorizzato tutte le metriche di tutte le matrici.
+    Matrici di dimensione diversa vengono allineate con padding a zero.
+    """
+    sizes = np.array([len(m) for m in matrices])
+    n = sizes.max(initial=0)
+    stacked = np.zeros((len(matrices), n, n))
+    for i, m in enumerate(matrices):
+        stacked[i, :sizes[i], :sizes[i]] = m
+    valid = np.arange(n) < sizes[:, None]
+
+    tp = np.diagonal(stacked, axis1=1, axis2=2)
+    predicted = stacked.sum(axis=1)
+    actual = stacked.sum(axis=2)
+
+    precision = _divide(tp, predicted)
+    recall = _divide(tp, actual)
+    f1 = _divide(2 * precision * recall, precision + recall)
+
+    accuracy = _divide(tp.sum(axis=1), actual.sum(axis=1))
+    # Classificazione a etichetta singola: le metriche micro coincidono con l'accuratezza
+    micro = np.repeat(accuracy[:, None], 3, axis=1)
+    per_class = np.stack([precision, recall, f1], axis=2)
+    macro = _divide((per_class * valid[:, :, None]).sum(axis=1), sizes[:, None].astype(float))
+
+    return DerivedMetrics(precision, recall, f1, micro, macro, accuracy)
+
+def _classifiers(datasets: Datasets) -> list[Classifier]:
+    return [clf for entry in datasets.root.values() for clf in entry.classifiers.values()]
+
+def fill_missing(datasets: Datasets):
+    """
+    Completa i classificatori privi di metriche per classe, aggregati o accuratezza
+    derivandoli dalla matrice di confusione. I valori già presenti non vengono toccati.
+    """
+    classifiers = _classifiers(datasets)
+    missing = [clf for clf in classifiers if clf.classes is None or clf.aggregates is None or clf.global_accuracy is None]
+    if not missing:
+        return
+
+    derived = derive([clf.confusion_matrix.matrix for clf in missing])
+    for i, clf in enumerate(missing):
+        if clf.classes is None:
+            clf.classes = {
+                c: ClassMetrics(precision=derived.precision[i, j], recall=derived.recall[i, j], f1_score=derived.f1_score[i, j])
+                for j, c in enumerate(clf.confusion_matrix.classes)
+            }
+        if clf.aggregates is None:
+            clf.aggregates = Aggregates(
+                micro=ClassMetrics(**dict(zip(ClassMetrics.model_fields, derived.micro[i]))),
+                macro=ClassMetrics(**dict(zip(ClassMetrics.model_fields, derived.macro[i]))),
+            )
+        if clf.global_accuracy is None:
+            clf.global_accuracy = float(derived.accuracy[i])
+
+def verify(datasets: Datasets, tolerance: float = 1e-3) -> list[str]:
+    """
+    Confronta le metriche salvate in data.json con quelle derivate dalle matrici di confusione.
+    Restituisce una descrizione per ogni valore che differisce più della tolleranza.
+    """
+    problems = []
+    entries = [
+        (dataset_name, clf_name, clf)
+        for dataset_name, entry in datasets.root.items()
+        for clf_name, clf in entry.classifiers.items()
+    ]
+    derived = derive([clf.confusion_matrix.matrix for _, _, clf in entries])
+
+    def check(where: str, stored: float, expected: float):
+        if abs(stored - expected) > tolerance:
+            problems.append(f"{where}: {stored:.6f} != {expected:.6f}")
+
+    for i, (dataset_name, clf_name, clf) in enumerate(entries):
+        prefix = f"{dataset_name.value}/{clf_name.value}"
+        check(f"{prefix}/global_accuracy", clf.global_accuracy, derived.accuracy[i])
+        for j, c in enumerate(clf.confusion_matrix.classes):
+            if c not in clf.classes:
+                problems.append(f"{prefix}/{c.value}: metriche mancanti")
+                continue
+            for metric in ClassMetrics.model_fields:
+                check(f"{prefix}/{c.value}/{metric}", getattr(clf.classes[c], metric), getattr(derived, metric)[i, j])
+        for agg in Aggregates.model_fields:
+            for k, metric in enumerate(ClassMetrics.model_fields):
+                check(f"{prefix}/{agg}/{metric}", getattr(getattr(clf.aggregates, agg), metric), getattr(derived, agg)[i, k])
+    return problems
+
+if __name__ == "__main__":
+    print("This file it's not intended to be run")
+    exit(1)
@@ -1,6 +1,6 @@
 from enum import Enum
-from typing import Dict
-from pydantic import BaseModel, RootModel, ConfigDict
+from typing import Any, Dict
+from pydantic import BaseModel, RootModel, ConfigDict, PrivateAttr, model_validator
 
 # ----- Enums for type-safe keys -----
 class ClassName(str, Enum):
@@ -25,6 +25,7 @@ class DatasetName(str, Enum):
 class ClassifierName(str, Enum):
     XGBoost = "XGBoost"
     RandomForest = "RandomForest"
+    Markov = "Markov"  # catene di Markov per classe sulle transizioni tra API (graph/apicall/markov.py)
 
 # ----- Models -----
 class ClassCounts(BaseModel):
@@ -49,20 +50,27 @@ class ConfusionMatrix(BaseModel):
 
 
 class Classifier(BaseModel):
-    classes: Dict[ClassName, ClassMetrics]
+    # Se assenti vengono derivati dalla matrice di confusione (vedi metrics.py)
+    classes: Dict[ClassName, ClassMetrics] | None = None
     confusion_matrix: ConfusionMatrix
-    aggregates: Aggregates
-    global_accuracy: float
+    aggregates: Aggregates | None = None
+    global_accuracy: float | None = None
     model_config = ConfigDict(extra="forbid")
 
 class DatasetEntry(BaseModel):
     classes: Dict[ClassName, ClassCounts]  # Optional keys allowed
     classifiers: Dict[ClassifierName, Classifier]
     model_config = ConfigDict(extra="forbid")
+    _store: Any = PrivateAttr(default=None)  # vista colonnare (store.MetricsStore), se costruita
 
 # ----- Root model -----
 class Datasets(RootModel[Dict[DatasetName, DatasetEntry]]):
-    pass
+
+    @model_validator(mode="after")
+    def derive_metrics(self):
+        from metrics import fill_missing
+        fill_missing(self)
+        return self
 
 if __name__ == "__main__":
     print("This file it's not intended to be run")
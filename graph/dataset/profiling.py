@@ -0,0 +1,245 @@
+import argparse
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+PHASES = ("data", "artists", "tight_layout", "savefig")
+
+class Record:
+    """Tempi e dimensioni di una singola chiamata a una funzione di disegno."""
+
+    def __init__(self, chart: str):
+        self.chart = chart
+        self.total = 0.0
+        self.phases = defaultdict(float)
+        self.savefig = defaultdict(float)  # tempo di savefig per formato
+        self.outputs = []
+
+    def to_dict(self) -> dict:
+        phases = {phase: self.phases[phase] for phase in PHASES}
+        # Tutto quello che non è stato speso dentro matplotlib è preparazione dei dati
+        phases["data"] = max(self.total - sum(v for k, v in phases.items() if k != "data"), 0.0)
+        return {
+            "chart": self.chart,
+            "seconds": self.total,
+            "phases": phases,
+            "savefig_by_format": dict(self.savefig),
+            "outputs": self.outputs,
+        }
+
+class Profiler:
+    """
+    Strumentazione opzionale dei grafici: avvolge i metodi pubblici di Figure, Axes e pyplot
+    e attribuisce il tempo alle fasi artists / tight_layout / savefig (solo la chiamata più esterna
+    viene misurata, così le chiamate annidate non sono contate due volte).
+    Per ogni savefig registra formato, byte scritti e numero di artist della figura.
+    Copre solo matplotlib: il tempo speso in altre librerie (es. graphviz) finisce tutto nella fase data.
+    """
+
+    def __init__(self):
+        self.records: list[Record] = []
+        self._current: Record | None = None
+        self._depth = 0
+        self._patched = []
+
+    # ----- Installazione -----
+    def install(self):
+        import matplotlib.pyplot as plt
+        from matplotlib.axes import Axes
+        from matplotlib.figure import Figure
+
+        for owner in (Figure, Axes):
+            for name, fn in inspect.getmembers(owner, inspect.isfunction):
+                # staticmethod e classmethod restano come sono: il wrapper li trasformerebbe in metodi.
+                # I getter non creano artist e matplotlib confronta alcuni di essi (get_data_ratio) con l'originale.
+                if (not name.startswith(("_", "get_", "is_", "has_")) or name == "__init__") and \
+                        not isinstance(inspect.getattr_static(owner, name), (staticmethod, classmethod)):
+                    self._patch(owner, name, fn)
+        for name, fn in inspect.getmembers(plt, inspect.isfunction):
+            if not name.startswith("_") and fn.__module__ == plt.__name__:
+                self._patch(plt, name, fn)
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._patched):
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self._patched.clear()
+
+    def _patch(self, owner, name: str, fn):
+        phase = name if name in ("tight_layout", "savefig") else "artists"
+        original = owner.__dict__.get(name) if isinstance(owner, type) else getattr(owner, name)
+        profiler = self
+
+        def wrapper(*args, **kwargs):
+            if profiler._current is None or profiler._depth:
+                return fn(*args, **kwargs)
+            profiler._depth += 1
+            info = profiler._savefig_info(owner, args, kwargs) if phase == "savefig" else None
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                profiler._depth -= 1
+                profiler._current.phases[phase] += elapsed
+                if info is not None:
+                    profiler._current.savefig[info["format"]] += elapsed
+                    if info["path"] and os.path.exists(info["path"]):
+                        info["bytes"] = os.path.getsize(info["path"])
+                    profiler._current.outputs.append(info)
+
+        wrapper.__wrapped__ = fn
+        setattr(owner, name, wrapper)
+        self._patched.append((owner, name, original))
+
+    @staticmethod
+    def _savefig_info(owner, args, kwargs) -> dict:
+        import matplotlib
+        import matplotlib.pyplot as plt
+
+        if isinstance(owner, type):
+            fig, args = args[0], args[1:]
+        else:
+            fig = plt.gcf()
+        fname = args[0] if args else kwargs.get("fname")
+        path = os.fspath(fname) if isinstance(fname, (str, os.PathLike)) else None
+        fmt = kwargs.get("format") or (Path(path).suffix.lstrip(".") if path else "") or matplotlib.rcParams["savefig.format"]
+        return {"path": path, "format": fmt, "bytes": None, "artists": len(fig.findobj())}
+
+    # ----- Misura -----
+    @contextmanager
+    def chart(self, name: str):
+        record = Record(name)
+        self._current = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.total = time.perf_counter() - start
+            self._current = None
+            self.records.append(record)
+
+    # ----- Report -----
+    def report(self) -> dict:
+        records = [r.to_dict() for r in self.records]
+        summary = defaultdict(float)
+        for r in records:
+            for phase, seconds in r["phases"].items():
+                summary[phase] += seconds
+        return {"summary": dict(summary), "records": records}
+
+    def folded(self) -> str:
+        """Stack "collassati" (chart;fase;formato microsecondi), leggibili da flamegraph.pl e speedscope."""
+        lines = []
+        for record in self.records:
+            r = record.to_dict()
+            for phase, seconds in r["phases"].items():
+                if phase == "savefig":
+                    for fmt, s in r["savefig_by_format"].items():
+                        lines.append(f"{r['chart']};savefig;{fmt} {round(s * 1e6)}")
+                elif seconds:
+                    lines.append(f"{r['chart']};{phase} {round(seconds * 1e6)}")
+        return "\n".join(lines) + "\n"
+
+def profile_charts(profiler: Profiler, data: Path, charts: list[str], exts: list[str], output_folder: Path):
+    """Esegue i grafici di dataset.py su data.json, una chiamata misurata per (dataset, grafico, formato)."""
+    from dataset import CHARTS, MediaOutput
+    from loader import iter_datasets
+
+    for name, entry in iter_datasets(data):
+        for chart in charts:
+            for ext in exts:
+                with profiler.chart(f"{chart}/{name.value}/{ext}"):
+                    CHARTS[chart].function(entry, name, output_folder, MediaOutput(ext), **CHARTS[chart].options)
+
+def uses_matplotlib(script: Path) -> bool:
+    """True se lo script importa matplotlib: per gli altri le fasi misurate dal Profiler sarebbero vuote."""
+    return any(
+        line.split()[1].split(".")[0] == "matplotlib"
+        for line in Path(script).read_text().splitlines()
+        if line.strip().startswith(("import ", "from ")) and len(line.split()) > 1
+    )
+
+def profile_script(profiler: Profiler, script: Path, functions: list[str] | None, output_folder: Path):
+    """
+    Importa uno script (es. graph/ppt/*/main.py) e misura le sue funzioni di primo livello:
+    quelle indicate, oppure tutte quelle chiamabili senza argomenti.
+    Gli script salvano con percorsi relativi, quindi girano con output_folder come cartella corrente.
+    Sono accettati solo gli script che usano matplotlib (vedi uses_matplotlib).
+    """
+    script = script.resolve()
+    if not uses_matplotlib(script):
+        raise ValueError(f"{script}: non usa matplotlib, le fasi del profilo sarebbero vuote")
+    spec = importlib.util.spec_from_file_location(f"profiled_{script.parent.name}_{script.stem}", script)
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, str(script.parent))
+    cwd = os.getcwd()
+    os.chdir(output_folder)
+    try:
+        spec.loader.exec_module(module)
+        if functions is None:
+            functions = [
+                name for name, fn in inspect.getmembers(module, inspect.isfunction)
+                if fn.__module__ == module.__name__ and not name.startswith("_")
+                and all(p.default is not p.empty for p in inspect.signature(fn).parameters.values())
+            ]
+        for name in functions:
+            with profiler.chart(f"{script.parent.name}/{script.name}:{name}"):
+                try:
+                    getattr(module, name)()
+                except Exception as e:
+                    print(f"{script}:{name} fallito: {type(e).__name__}: {e}", file=sys.stderr)
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(str(script.parent))
+
+def main():
+    from dataset import CHARTS, DATA_FILE, MediaOutput
+
+    parser = argparse.ArgumentParser(description="Profilo per fase (dati, artist, tight_layout, savefig) dei grafici")
+    parser.add_argument("--charts", nargs="*", choices=list(CHARTS), default=list(CHARTS),
+                        help="grafici di dataset.py da misurare (default: tutti; nessuno con --charts senza argomenti)")
+    parser.add_argument("--ext", nargs="+", choices=[m.value for m in MediaOutput], default=[m.value for m in MediaOutput])
+    parser.add_argument("--data", type=Path, default=DATA_FILE)
+    parser.add_argument("--script", type=Path, action="append", default=[], help="script aggiuntivo da misurare (ripetibile, solo script matplotlib)")
+    parser.add_argument("--functions", nargs="+", help="funzioni da misurare negli script (default: quelle senza argomenti)")
+    parser.add_argument("--report", type=Path, default=Path("profile-report.json"))
+    parser.add_argument("--folded", type=Path, help="scrive anche gli stack collassati per un flame graph")
+    args = parser.parse_args()
+    for script in args.script:
+        if not uses_matplotlib(script):
+            parser.error(f"{script} non usa matplotlib: il profilo per fase copre solo i grafici matplotlib")
+
+    import matplotlib
+    matplotlib.use("Agg")
+    profiler = Profiler()
+    profiler.install()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            if args.charts:
+                profile_charts(profiler, args.data, args.charts, args.ext, Path(tmp))
+            for script in args.script:
+                profile_script(profiler, script, args.functions, Path(tmp))
+        finally:
+            profiler.uninstall()
+
+    report = profiler.report()
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=4)
+    if args.folded:
+        args.folded.write_text(profiler.folded())
+    for phase, seconds in sorted(report["summary"].items(), key=lambda item: -item[1]):
+        print(f"{phase:<14} {seconds:8.2f}s")
+    print(f"Report salvato in: {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+from model import DatasetEntry, DatasetName
+
+class RenderJob(NamedTuple):
+    """
+    Unità di lavoro indipendente: un grafico (per nome nel registro CHARTS di dataset.py)
+    applicato a un dataset, eventualmente ristretto a un solo classificatore.
+    """
+    chart: str
+    dataset_name: DatasetName
+    dataset: DatasetEntry
+    output_folder: Path
+    ext: str
+    dpi: float | str | None = None  # None: dpi predefinito del grafico
+
+def _init_worker():
+    # Ogni processo ha il suo backend Agg, impostato prima che pyplot venga caricato
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _render(job: RenderJob) -> RenderJob:
+    from dataset import CHARTS, MediaOutput
+    chart = CHARTS[job.chart]
+    kwargs = dict(chart.options) if job.dpi is None else {**chart.options, "dpi": job.dpi}
+    chart.function(job.dataset, job.dataset_name, job.output_folder, MediaOutput(job.ext), **kwargs)
+    return job
+
+def build_jobs(datasets: Iterable[tuple[DatasetName, DatasetEntry]], charts: Iterable[str], output_folder: Path, ext: str,
+               dpi: float | str | None = None) -> Iterator[RenderJob]:
+    """
+    Scompone il report in job (dataset, classificatore, grafico), un dataset alla volta:
+    i job di un dataset sono disponibili appena questo è stato caricato.
+    I grafici per classificatore ricevono una copia del dataset con il solo classificatore di interesse.
+    I grafici senza dati (es. nessun risultato per i classificatori selezionati) vengono saltati.
+    """
+    from dataset import CHARTS
+    charts = list(charts)
+    for dataset_name, dataset in datasets:
+        for chart in charts:
+            if not CHARTS[chart].data(dataset):
+                continue
+            if not CHARTS[chart].per_classifier:
+                yield RenderJob(chart, dataset_name, dataset, output_folder, ext, dpi)
+                continue
+            for clf_name, clf_data in dataset.classifiers.items():
+                single = dataset.model_copy(update={"classifiers": {clf_name: clf_data}})
+                yield RenderJob(chart, dataset_name, single, output_folder, ext, dpi)
+
+def run_jobs(jobs: Iterable[RenderJob], workers: int | None = None) -> Iterator[RenderJob]:
+    """
+    Esegue i job su un pool di processi (di default uno per core).
+    Con workers=1 i job vengono eseguiti in sequenza nel processo corrente.
+    I job vengono inviati al pool man mano che arrivano, con al più 2 * workers job in volo
+    (come shard._ordered_map): in memoria restano solo i dataset dei job in volo.
+    I job vengono prodotti man mano che vengono completati.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker()
+        for job in jobs:
+            yield _render(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker) as pool:
+        pending = set()
+        for job in jobs:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(_render, job))
+        for future in as_completed(pending):
+            yield future.result()
+
+if __name__ == "__main__":
+    print("This file it's not intended to be run")
+    exit(1)
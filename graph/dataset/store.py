@@ -0,0 +1,138 @@
+from typing import NamedTuple
+import numpy as np
+from model import ClassName, DatasetName, ClassifierName, DatasetEntry, Datasets
+
+METRICS = ("precision", "recall", "f1_score")
+AGGREGATES = ("micro", "macro")
+
+class _ClassifierData(NamedTuple):
+    classes: dict[ClassName, tuple[float, float, float]] | None
+    matrix_classes: list[ClassName]
+    matrix: list[list[int]]
+    aggregates: tuple[tuple[float, float, float], tuple[float, float, float]] | None
+    global_accuracy: float | None
+
+class _EntryData(NamedTuple):
+    classes: dict[ClassName, tuple[int, int]]
+    classifiers: dict[ClassifierName, _ClassifierData]
+
+class MetricsStore:
+    """
+    Rappresentazione colonnare di Datasets: array NumPy indicizzati per
+    (dataset, classificatore, classe, metrica), costruiti una volta al caricamento.
+    I valori assenti sono NaN (metriche) o -1 (conteggi). L'ordine delle classi di ogni
+    dataset/classificatore viene conservato, così i grafici restano identici.
+    """
+
+    def __init__(self, entries: dict[DatasetName, _EntryData]):
+        self.datasets = list(entries)
+        self.classifiers = list(dict.fromkeys(k for e in entries.values() for k in e.classifiers))
+        self.classes = list(dict.fromkeys(
+            c for e in entries.values()
+            for c in [*e.classes, *(c for clf in e.classifiers.values() for c in [*(clf.classes or {}), *clf.matrix_classes])]
+        ))
+        self._dataset_index = {d: i for i, d in enumerate(self.datasets)}
+        self._classifier_index = {k: i for i, k in enumerate(self.classifiers)}
+        self._class_index = {c: i for i, c in enumerate(self.classes)}
+
+        D, K, C, M = len(self.datasets), len(self.classifiers), len(self.classes), len(METRICS)
+        self.values = np.full((D, K, C, M), np.nan)
+        self.counts = np.full((D, C, 2), -1, dtype=np.int64)
+        self.aggregates = np.full((D, K, len(AGGREGATES), M), np.nan)
+        self.accuracy = np.full((D, K), np.nan)
+        self.entry_classes: dict[DatasetName, list[ClassName]] = {}
+        self.classifier_classes: dict[tuple[DatasetName, ClassifierName], list[ClassName]] = {}
+
+        missing = []
+        for d, (name, entry) in enumerate(entries.items()):
+            self.entry_classes[name] = list(entry.classes)
+            if entry.classes:
+                index = [self._class_index[c] for c in entry.classes]
+                self.counts[d, index] = list(entry.classes.values())
+            for clf_name, clf in entry.classifiers.items():
+                k = self._classifier_index[clf_name]
+                if clf.classes is None or clf.aggregates is None or clf.global_accuracy is None:
+                    missing.append((d, k, name, clf_name, clf))
+                if clf.classes is not None:
+                    self.classifier_classes[name, clf_name] = list(clf.classes)
+                    if clf.classes:
+                        index = [self._class_index[c] for c in clf.classes]
+                        self.values[d, k, index] = list(clf.classes.values())
+                if clf.aggregates is not None:
+                    self.aggregates[d, k] = clf.aggregates
+                if clf.global_accuracy is not None:
+                    self.accuracy[d, k] = clf.global_accuracy
+        self._derive(missing)
+
+    def _derive(self, missing: list):
+        """Completa con metrics.derive i classificatori privi di metriche, in un solo passaggio."""
+        if not missing:
+            return
+        from metrics import derive
+        derived = derive([clf.matrix for *_, clf in missing])
+        for i, (d, k, name, clf_name, clf) in enumerate(missing):
+            if clf.classes is None:
+                self.classifier_classes[name, clf_name] = list(clf.matrix_classes)
+                index = [self._class_index[c] for c in clf.matrix_classes]
+                n = len(index)
+                self.values[d, k, index] = np.stack([derived.precision[i, :n], derived.recall[i, :n], derived.f1_score[i, :n]], axis=1)
+            if clf.aggregates is None:
+                self.aggregates[d, k] = [derived.micro[i], derived.macro[i]]
+            if clf.global_accuracy is None:
+                self.accuracy[d, k] = derived.accuracy[i]
+
+    # ----- Costruzione -----
+    @classmethod
+    def from_datasets(cls, datasets: Datasets | dict[DatasetName, DatasetEntry]) -> "MetricsStore":
+        """Costruisce lo store da modelli già validati e lo associa a ciascun DatasetEntry."""
+        root = datasets.root if isinstance(datasets, Datasets) else datasets
+        entries = {}
+        for name, entry in root.items():
+            entries[name] = _EntryData(
+                classes={c: (v.test, v.eval) for c, v in entry.classes.items()},
+                classifiers={
+                    clf_name: _ClassifierData(
+                        classes=None if clf.classes is None else {c: (m.precision, m.recall, m.f1_score) for c, m in clf.classes.items()},
+                        matrix_classes=clf.confusion_matrix.classes,
+                        matrix=clf.confusion_matrix.matrix,
+                        aggregates=None if clf.aggregates is None else tuple(
+                            (a.precision, a.recall, a.f1_score) for a in (clf.aggregates.micro, clf.aggregates.macro)
+                        ),
+                        global_accuracy=clf.global_accuracy,
+                    )
+                    for clf_name, clf in entry.classifiers.items()
+                },
+            )
+        store = cls(entries)
+        for entry in root.values():
+            entry._store = store
+        return store
+
+    # ----- Accesso per i grafici -----
+    def class_metrics(self, dataset: DatasetName, classifier: ClassifierName, classes: list[ClassName] | None = None) -> np.ndarray:
+        """Matrice (classi, metriche) con precision, recall e f1_score, nell'ordine di classes."""
+        if classes is None:
+            classes = self.classifier_classes[dataset, classifier]
+        return self.values[self._dataset_index[dataset], self._classifier_index[classifier], [self._class_index[c] for c in classes]]
+
+    def class_counts(self, dataset: DatasetName, classes: list[ClassName] | None = None) -> np.ndarray:
+        """Matrice (classi, 2) con le istanze di test e di training, nell'ordine di classes."""
+        if classes is None:
+            classes = self.entry_classes[dataset]
+        return self.counts[self._dataset_index[dataset], [self._class_index[c] for c in classes]]
+
+    def global_metrics(self, dataset: DatasetName, classifiers: list[ClassifierName]) -> np.ndarray:
+        """Per ogni classificatore: accuratezza, micro e macro (precision, recall, f1_score)."""
+        d = self._dataset_index[dataset]
+        k = [self._classifier_index[c] for c in classifiers]
+        return np.concatenate([self.accuracy[d, k][:, None], self.aggregates[d, k].reshape(len(k), -1)], axis=1)
+
+def columns(entry: DatasetEntry, dataset_name: DatasetName) -> MetricsStore:
+    """Store colonnare associato a entry al caricamento (costruito al volo se manca)."""
+    if entry._store is None or dataset_name not in entry._store._dataset_index:
+        MetricsStore.from_datasets({dataset_name: entry})
+    return entry._store
+
+if __name__ == "__main__":
+    print("This file it's not intended to be run")
+    exit(1)
@@ -0,0 +1,56 @@
+from typing import Callable, Hashable
+import numpy as np
+from matplotlib.figure import Figure
+
+class BarPanel:
+    """
+    Gruppi di barre (con le etichette dei valori) di un singolo asse.
+    Le barre vengono create una volta sola ad altezza zero; update() cambia solo altezze e testi.
+    """
+
+    def __init__(self, ax, x: np.ndarray, width: float, series: list[tuple[float, str, str | None]],
+                 label_offset: float, label_format: str = "{:.2f}", **text_kwargs):
+        self.ax = ax
+        self.label_offset = label_offset
+        self.label_format = label_format
+        self.containers = []
+        self.texts = []
+        # series: (spostamento rispetto a x, colore, etichetta di legenda)
+        for offset, color, label in series:
+            bars = ax.bar(x + offset, np.zeros(len(x)), width=width, color=color, label=label)
+            texts = [
+                ax.text(bar.get_x() + bar.get_width() / 2, 0, "", ha="center", va="bottom", **text_kwargs)
+                for bar in bars
+            ]
+            self.containers.append(bars)
+            self.texts.append(texts)
+
+    def update(self, *values: list[float]):
+        for bars, texts, heights in zip(self.containers, self.texts, values):
+            for bar, text, height in zip(bars, texts, heights):
+                bar.set_height(height)
+                text.set_y(height + self.label_offset)
+                text.set_text(self.label_format.format(height))
+
+class ChartTemplate:
+    """Figura riutilizzabile: assi, tick e barre sono costruiti (e impaginati) una sola volta."""
+
+    def __init__(self, fig: Figure, panels: list[BarPanel]):
+        self.fig = fig
+        self.panels = panels
+
+    def save(self, output, **kwargs):
+        self.fig.savefig(output, **kwargs)
+
+# Template per processo, indicizzati per (grafico, disposizione delle classi)
+_TEMPLATES: dict[Hashable, ChartTemplate] = {}
+
+def get_template(key: Hashable, factory: Callable[[], ChartTemplate]) -> ChartTemplate:
+    template = _TEMPLATES.get(key)
+    if template is None:
+        template = _TEMPLATES[key] = factory()
+    return template
+
+if __name__ == "__main__":
+    print("This file it's not intended to be run")
+    exit(1)
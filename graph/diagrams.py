@@ -0,0 +1,147 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple
+import graphviz
+
+GRAPH_DIR = Path(__file__).resolve().parent
+MANIFEST = ".diagram-manifest.json"
+
+class Diagram(NamedTuple):
+    """
+    Un grafo da renderizzare: sorgente DOT, motore e formato di graphviz, file di output con estensione.
+    Il sorgente è già serializzato, così i job sono indipendenti dall'oggetto Digraph che li ha prodotti.
+    """
+    source: str
+    engine: str
+    format: str
+    output: Path
+
+    @classmethod
+    def of(cls, dot: graphviz.Digraph, filename: str | Path, format: str | None = None) -> "Diagram":
+        """Come dot.render(filename, format=format): l'output è filename.<formato>."""
+        format = format or dot.format
+        return cls(dot.source, dot.engine, format, Path(f"{filename}.{format}"))
+
+    def key(self) -> str:
+        return hashlib.sha256(f"{self.engine}|{self.format}\n{self.source}".encode()).hexdigest()
+
+class DiagramCache:
+    """
+    Manifest (uno per cartella di output) che associa ogni file prodotto all'hash del sorgente DOT,
+    del motore e del formato che l'hanno generato: i grafi invariati non vengono renderizzati di nuovo.
+    """
+
+    def __init__(self):
+        self.manifests: dict[Path, dict[str, str]] = {}
+
+    def _manifest(self, folder: Path) -> dict[str, str]:
+        folder = folder.resolve()
+        if folder not in self.manifests:
+            path = folder / MANIFEST
+            self.manifests[folder] = json.loads(path.read_text()) if path.exists() else {}
+        return self.manifests[folder]
+
+    def fresh(self, diagram: Diagram) -> bool:
+        """True se il file esiste ed è stato generato dallo stesso sorgente."""
+        entries = self._manifest(diagram.output.parent)
+        return entries.get(diagram.output.name) == diagram.key() and diagram.output.exists()
+
+    def store(self, diagram: Diagram):
+        self._manifest(diagram.output.parent)[diagram.output.name] = diagram.key()
+
+    def save(self):
+        for folder, entries in self.manifests.items():
+            with open(folder / MANIFEST, "w") as f:
+                json.dump(entries, f, indent=4, sort_keys=True)
+
+def _render(diagram: Diagram) -> Diagram:
+    """
+    Un processo dot per grafo, con il sorgente passato su stdin: nessun file .gv temporaneo.
+    L'immagine viene scritta accanto e poi rinominata, così un render interrotto non lascia file a metà.
+    """
+    image = graphviz.pipe(diagram.engine, diagram.format, diagram.source.encode())
+    diagram.output.parent.mkdir(parents=True, exist_ok=True)
+    partial = diagram.output.with_name(diagram.output.name + ".partial")
+    partial.write_bytes(image)
+    os.replace(partial, diagram.output)
+    return diagram
+
+def render_all(diagrams: Iterable[Diagram], workers: int | None = None, force: bool = False,
+               cache: DiagramCache | None = None) -> Iterator[tuple[Diagram, bool]]:
+    """
+    Renderizza i grafi su un pool di thread (il lavoro vero è nei processi dot, di default uno per core),
+    con al massimo 2 * workers render in corso. Produce (grafo, renderizzato) nell'ordine di arrivo;
+    i grafi il cui sorgente non è cambiato dall'ultimo render vengono saltati (se non force).
+    """
+    cache = cache if cache is not None else DiagramCache()
+    workers = workers or os.cpu_count() or 1
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for diagram in diagrams:
+                if not force and cache.fresh(diagram):
+                    yield diagram, False
+                    continue
+                pending.append(pool.submit(_render, diagram))
+                while len(pending) >= 2 * workers:
+                    done = pending.pop(0).result()
+                    cache.store(done)
+                    yield done, True
+            for future in pending:
+                done = future.result()
+                cache.store(done)
+                yield done, True
+    finally:
+        # Anche se un render fallisce, quelli completati restano nel manifest
+        cache.save()
+
+def _load(script: Path):
+    spec = importlib.util.spec_from_file_location(f"diagram_{script.parent.name}_{script.stem}", script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Script dei diagrammi -> funzione che ne costruisce i grafi, come coppie (Digraph, nome file senza estensione).
+# I file vengono scritti nella cartella dello script.
+DIAGRAMS: dict[str, tuple[Path, Callable[[object], list[tuple[graphviz.Digraph, str]]]]] = {
+    "bow_pipeline": (GRAPH_DIR / "apicall" / "apicall.py", lambda m: m.diagrammi()),
+    "sandbox": (GRAPH_DIR / "ppt" / "dynamic_analysis" / "main.py", lambda m: [(m.build_sandbox_diagram(), "sandbox_replication")]),
+    "xgboost": (GRAPH_DIR / "ppt" / "classificatori_xgboost" / "main.py", lambda m: [(m.build_xgboost_diagram(), "xgboost_diagram")]),
+}
+
+def collect(names: Iterable[str]) -> Iterator[Diagram]:
+    for name in names:
+        script, build = DIAGRAMS[name]
+        # Gli script importano i moduli vicini come moduli di primo livello
+        if str(script.parent) not in sys.path:
+            sys.path.append(str(script.parent))
+        for dot, filename in build(_load(script)):
+            yield Diagram.of(dot, script.parent / filename)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rigenera in modo incrementale tutti i diagrammi graphviz")
+    parser.add_argument("names", nargs="*", help=f"diagrammi da generare tra {', '.join(DIAGRAMS)} (default: tutti)")
+    parser.add_argument("--workers", type=int, default=None, help="render concorrenti (default: uno per core)")
+    parser.add_argument("--force", action="store_true", help="ignora il manifest e rigenera tutto")
+    args = parser.parse_args()
+    unknown = set(args.names) - DIAGRAMS.keys()
+    if unknown:
+        parser.error(f"diagrammi sconosciuti: {', '.join(sorted(unknown))}")
+
+    rendered = skipped = 0
+    for diagram, done in render_all(collect(args.names or DIAGRAMS), args.workers, args.force):
+        if done:
+            rendered += 1
+            print(f"Generato: {diagram.output.relative_to(GRAPH_DIR)}")
+        else:
+            skipped += 1
+    print(f"{rendered} diagrammi generati, {skipped} invariati")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
+from pathlib import Path
 from graphviz import Digraph
 
-def draw_xgboost_png():
+def build_xgboost_diagram() -> Digraph:
     # CAMBIAMENTO QUI: format='png' invece di 'pdf'
     dot = Digraph(comment='XGBoost Structure', format='png')
     
@@ -72,10 +73,13 @@ def draw_xgboost_png():
     dot.attr(label=r'\nVisualizzazione XGBoost (Ensemble Additivo)\nŷ_i = Σ fk(x_i)', 
              fontsize='14', fontname='Helvetica-Bold')
 
+    return dot
+
+def draw_xgboost_png():
     # Render
     filename = 'xgboost_diagram'
-    # view=False impedisce di provare ad aprire il file se non hai un visualizzatore installato nel container
-    output_path = dot.render(filename, view=False)
+    # graph/diagrams.py lo rigenera solo se il sorgente è cambiato
+    output_path = build_xgboost_diagram().render(Path(__file__).resolve().parent / filename)
     
     print(f"Grafico salvato con successo: {output_path} (Formato PNG)")
 
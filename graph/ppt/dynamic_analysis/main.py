@@ -1,6 +1,7 @@
+from pathlib import Path
 from graphviz import Digraph
 
-def create_sandbox_diagram():
+def build_sandbox_diagram() -> Digraph:
     dot = Digraph(comment='Sandbox Analysis', format='png')
     
     # --- Impostazioni Generali ---
@@ -103,9 +104,12 @@ def create_sandbox_diagram():
     # ma qui un collegamento diretto verso il basso funziona bene.
     dot.edge('api_list', 'db', xlabel='')
 
-    # Render
+    return dot
+
+def create_sandbox_diagram():
+    # Render (graph/diagrams.py lo rigenera solo se il sorgente è cambiato)
     filename = 'sandbox_replication'
-    dot.render(filename, view=False)
+    build_sandbox_diagram().render(Path(__file__).resolve().parent / filename)
     print(f"Grafico salvato come {filename}.png")
 
 if __name__ == "__main__":